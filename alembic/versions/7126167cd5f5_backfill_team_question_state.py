@@ -0,0 +1,50 @@
+"""backfill team question state
+
+Revision ID: 7126167cd5f5
+Revises: c76457297c44
+Create Date: 2026-10-18 19:24:03.118406
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+import sqlmodel
+
+
+# revision identifiers, used by Alembic.
+revision: str = '7126167cd5f5'
+down_revision: Union[str, Sequence[str], None] = 'c76457297c44'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Count the existing submissions like rebuild_team_question_state, now
+    # that their correctness is stored
+    op.execute("DELETE FROM team_question_state")
+    op.execute(
+        """
+        INSERT INTO team_question_state
+            (team_id, question_id, attempts, first_correct_at, score)
+        SELECT
+            submission.team_id,
+            submission.question_id,
+            count(*),
+            min(submission.timestamp) FILTER (WHERE submission.correct),
+            CASE
+                WHEN bool_or(submission.correct)
+                THEN power(0.9, count(*) - 1) * question.max_score
+                ELSE 0.0
+            END
+        FROM submission
+        JOIN question ON question.id = submission.question_id
+        GROUP BY submission.team_id, submission.question_id, question.max_score
+        """
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.execute("DELETE FROM team_question_state")
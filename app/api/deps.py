@@ -2,14 +2,16 @@ from typing import Annotated
 
 import jwt
 from fastapi import Cookie, Depends, HTTPException, status
-from sqlmodel import Session, select
+from sqlmodel import select
+from sqlmodel.ext.asyncio.session import AsyncSession
 
 from app.api.exception import RequiresLoginException
 from app.api.models import Team
+from app.api.team_cache import team_cache
 from app.core.config import settings
-from app.core.db import get_session
+from app.core.db import get_async_session
 
-SessionDep = Annotated[Session, Depends(get_session)]
+SessionDep = Annotated[AsyncSession, Depends(get_async_session)]
 
 
 async def authenticate_team(
@@ -23,9 +25,15 @@ async def authenticate_team(
         )
     except jwt.ExpiredSignatureError:
         raise RequiresLoginException
-    team = session.exec(select(Team).where(Team.id == team_jwt["id"])).first()
+    team = team_cache.get(team_jwt["id"])
     if team is None:
-        raise RequiresLoginException
+        generation = team_cache.generation
+        team = (
+            await session.exec(select(Team).where(Team.id == team_jwt["id"]))
+        ).first()
+        if team is None:
+            raise RequiresLoginException
+        team_cache.set(team, generation)
     return team
 
 
@@ -0,0 +1,138 @@
+"""Streamed csv exports for admins."""
+
+import csv
+import io
+import zlib
+from collections.abc import AsyncIterator
+
+from sqlalchemy import and_, func, true
+from sqlalchemy.dialects.postgresql import aggregate_order_by
+from sqlmodel import col, select
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from app.api.models import Question, Submission, Team, TeamQuestionState
+from app.core.db import async_engine
+
+# Rows fetched per round trip of the server-side cursor
+FETCH_ROWS = 1000
+# Bytes of csv rows collected before they are sent, the header row is sent
+# right away so the download starts before the first rows are fetched
+CHUNK_BYTES = 64 * 1024
+
+
+class CsvChunker:
+    """Write csv rows and hand them out in chunks of about `CHUNK_BYTES`."""
+
+    def __init__(self):
+        self.buffer = io.StringIO()
+        self.writer = csv.writer(self.buffer)
+
+    def write(self, row: list) -> bytes | None:
+        """Write `row`, and return the pending chunk once it is big enough."""
+        self.writer.writerow(row)
+        if self.buffer.tell() >= CHUNK_BYTES:
+            return self.flush()
+        return None
+
+    def flush(self) -> bytes:
+        chunk = self.buffer.getvalue().encode()
+        self.buffer.seek(0)
+        self.buffer.truncate()
+        return chunk
+
+
+async def teams_csv() -> AsyncIterator[bytes]:
+    """Yield a csv with the number of attempts of every team on every question."""
+    chunker = CsvChunker()
+    async with AsyncSession(async_engine) as session:
+        numbers = (
+            await session.exec(select(Question.number).order_by(Question.number))
+        ).all()
+        chunker.write(["Team Name"] + [f"Question #{number}" for number in numbers])
+        yield chunker.flush()
+
+        # One row per team, with its attempts ordered like the header
+        attempts = func.array_agg(
+            aggregate_order_by(
+                func.coalesce(TeamQuestionState.attempts, 0), Question.number
+            )
+        ).filter(col(Question.id).is_not(None))
+        result = await session.stream(
+            select(Team.name, attempts)
+            .select_from(Team)
+            .outerjoin(Question, true())
+            .outerjoin(
+                TeamQuestionState,
+                and_(
+                    TeamQuestionState.team_id == Team.id,
+                    TeamQuestionState.question_id == Question.id,
+                ),
+            )
+            .group_by(col(Team.id))
+            .order_by(Team.id)
+            .execution_options(yield_per=FETCH_ROWS)
+        )
+        async for name, team_attempts in result:
+            if chunk := chunker.write([name] + [str(a) for a in team_attempts or []]):
+                yield chunk
+    yield chunker.flush()
+
+
+async def answers_csv() -> AsyncIterator[bytes]:
+    """Yield a csv with every submission and whether it is correct."""
+    chunker = CsvChunker()
+    chunker.write(["Timestamp", "Team Name", "Question Number", "Answer", "Correct"])
+    yield chunker.flush()
+    async with AsyncSession(async_engine) as session:
+        result = await session.stream(
+            select(
+                Submission.timestamp,
+                Team.name,
+                Question.number,
+                Submission.answer,
+                Submission.correct,
+            )
+            .join(Team)
+            .join(Question)
+            .order_by(Submission.timestamp, Submission.id)
+            .execution_options(yield_per=FETCH_ROWS)
+        )
+        async for timestamp, name, number, answer, correct in result:
+            row = [timestamp.strftime("%x %X"), name, number, answer, correct]
+            if chunk := chunker.write(row):
+                yield chunk
+    yield chunker.flush()
+
+
+def accepts_gzip(accept_encoding: str) -> bool:
+    """Return whether an `Accept-Encoding` header allows a gzip response."""
+    qualities = {}
+    for coding in accept_encoding.split(","):
+        name, *params = [part.strip() for part in coding.split(";")]
+        quality = 1.0
+        for param in params:
+            key, _, value = param.partition("=")
+            if key.strip().lower() == "q":
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        if name:
+            qualities[name.lower()] = quality
+    for name in ("gzip", "x-gzip", "*"):
+        if name in qualities:
+            return qualities[name] > 0
+    return False
+
+
+async def gzip_chunks(chunks: AsyncIterator[bytes]) -> AsyncIterator[bytes]:
+    """
+    Compress a stream of chunks into a single gzip stream.
+
+    Every chunk is flushed, so the client gets it without waiting for the
+    compressor to fill its own buffer.
+    """
+    compressor = zlib.compressobj(wbits=31)
+    async for chunk in chunks:
+        yield compressor.compress(chunk) + compressor.flush(zlib.Z_SYNC_FLUSH)
+    yield compressor.flush()
@@ -0,0 +1,127 @@
+"""Batched ingestion of submissions."""
+
+import asyncio
+import logging
+
+from sqlalchemy import insert
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from app.api.models import Question, Submission
+from app.api.scores import record_submissions
+from app.core.config import settings
+from app.core.db import async_engine
+
+logger = logging.getLogger(__name__)
+
+Entry = tuple[Submission, Question, asyncio.Future]
+
+
+class SubmissionBatcher:
+    """
+    Commit the submissions of concurrent requests in shared transactions.
+
+    `submit` queues a submission and returns once the transaction holding
+    it is committed. A single task collects what arrives within `window`
+    seconds, up to `max_size` submissions, and inserts it with one
+    multi-row INSERT and one upsert of the team question states, so a burst
+    costs one commit instead of one per submission.
+    """
+
+    def __init__(self, window: float, max_size: int):
+        self.window = window
+        self.max_size = max_size
+        self.batches = 0
+        self.submissions = 0
+        self._queue: asyncio.Queue[Entry] = asyncio.Queue()
+        self._task: asyncio.Task | None = None
+
+    async def submit(self, submission: Submission, question: Question):
+        """Queue `submission` and wait until it is committed."""
+        future = asyncio.get_running_loop().create_future()
+        self._queue.put_nowait((submission, question, future))
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+        await future
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+
+    async def _collect(self) -> list[Entry]:
+        loop = asyncio.get_running_loop()
+        batch = [await self._queue.get()]
+        deadline = loop.time() + self.window
+        while len(batch) < self.max_size:
+            try:
+                batch.append(self._queue.get_nowait())
+                continue
+            except asyncio.QueueEmpty:
+                pass
+            timeout = deadline - loop.time()
+            if timeout <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+            except TimeoutError:
+                break
+        return batch
+
+    async def _run(self):
+        while True:
+            batch = await self._collect()
+            try:
+                await self._insert(batch)
+            except Exception:
+                if len(batch) == 1:
+                    logger.exception("Could not insert a submission")
+                    self._finish(batch, exception=True)
+                    continue
+                # Retry them one by one, so only the submissions that can't be
+                # inserted (for example of a deleted team) fail
+                for entry in batch:
+                    try:
+                        await self._insert([entry])
+                    except Exception:
+                        logger.exception("Could not insert a submission")
+                        self._finish([entry], exception=True)
+                    else:
+                        self._finish([entry])
+            else:
+                self._finish(batch)
+
+    async def _insert(self, batch: list[Entry]):
+        async with AsyncSession(async_engine) as session:
+            await session.exec(
+                insert(Submission).values(
+                    [
+                        submission.model_dump(exclude={"id"})
+                        for submission, _, _ in batch
+                    ]
+                )
+            )
+            await record_submissions(
+                session, [(submission, question) for submission, question, _ in batch]
+            )
+            await session.commit()
+        self.batches += 1
+        self.submissions += len(batch)
+
+    @staticmethod
+    def _finish(batch: list[Entry], exception: bool = False):
+        for _, _, future in batch:
+            # The request may have been cancelled while it waited
+            if future.done():
+                continue
+            if exception:
+                future.set_exception(RuntimeError("Could not insert the submission"))
+            else:
+                future.set_result(None)
+
+
+submission_batcher = SubmissionBatcher(
+    settings.SUBMISSION_BATCH_MILLISECONDS / 1000, settings.SUBMISSION_BATCH_SIZE
+)
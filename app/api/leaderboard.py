@@ -0,0 +1,222 @@
+"""Leaderboard snapshot shared by every viewer of a worker."""
+
+import asyncio
+import json
+import logging
+from collections.abc import AsyncIterator
+from dataclasses import dataclass
+
+from sqlalchemy import func, literal_column
+from sqlalchemy.dialects.postgresql import aggregate_order_by
+from sqlmodel import select
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from app.api.models import Question, Submission, Team, TeamQuestionState
+from app.api.utils import logo_url
+from app.core.config import settings
+from app.core.db import async_engine
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True)
+class LeaderboardEntry:
+    team_id: int
+    name: str
+    quality: float
+    img: str
+
+
+@dataclass(frozen=True)
+class LeaderboardSnapshot:
+    version: tuple
+    entries: list[LeaderboardEntry]
+
+
+def _fingerprint(*columns):
+    """Return a subquery hashing `columns` over all rows of their table."""
+    return select(
+        func.md5(
+            func.string_agg(
+                func.concat_ws(":", *columns),
+                aggregate_order_by(literal_column("','"), columns[0]),
+            )
+        )
+    ).scalar_subquery()
+
+
+async def leaderboard_version(session: AsyncSession) -> tuple:
+    """
+    Return a cheap fingerprint of everything the leaderboard depends on.
+
+    It changes whenever a submission is added or removed, or a team or
+    question is created, deleted or updated. Submissions are counted from
+    team_question_state, so this doesn't scan the submission table.
+    """
+    return tuple(
+        (
+            await session.exec(
+                select(
+                    select(func.sum(TeamQuestionState.attempts)).scalar_subquery(),
+                    select(func.max(Submission.id)).scalar_subquery(),
+                    _fingerprint(Team.id, Team.name, Team.admin),
+                    _fingerprint(
+                        Question.id,
+                        Question.max_score,
+                        Question.solution,
+                        Question.accuracy,
+                    ),
+                )
+            )
+        ).one()
+    )
+
+
+async def compute_leaderboard(
+    session: AsyncSession, version: tuple
+) -> LeaderboardSnapshot:
+    """Compute the quality of every team from the team_question_state table."""
+    teams = (
+        await session.exec(
+            select(Team).where(Team.admin == False).order_by(Team.id)  # noqa: E712
+        )
+    ).all()
+    max_score = (
+        await session.exec(select(func.coalesce(func.sum(Question.max_score), 0.0)))
+    ).one()
+    team_scores = dict(
+        (
+            await session.exec(
+                select(
+                    TeamQuestionState.team_id, func.sum(TeamQuestionState.score)
+                ).group_by(TeamQuestionState.team_id)
+            )
+        ).all()
+    )
+
+    entries: list[LeaderboardEntry] = []
+    for team in teams:
+        score = team_scores.get(team.id, 0.0)
+        quality = score / max_score if max_score != 0 else 1
+        entries.append(LeaderboardEntry(team.id, team.name, quality, logo_url(quality)))
+
+    return LeaderboardSnapshot(version, entries)
+
+
+class LeaderboardCache:
+    """Keep the latest snapshot and only rebuild it when its version changes."""
+
+    def __init__(self):
+        self._lock = asyncio.Lock()
+        self._snapshot: LeaderboardSnapshot | None = None
+
+    async def get(self, session: AsyncSession) -> LeaderboardSnapshot:
+        version = await leaderboard_version(session)
+        async with self._lock:
+            if self._snapshot is None or self._snapshot.version != version:
+                self._snapshot = await compute_leaderboard(session, version)
+            return self._snapshot
+
+
+leaderboard_cache = LeaderboardCache()
+
+
+class LeaderboardBroadcaster:
+    """
+    Push new leaderboard snapshots to every subscriber of this worker.
+
+    A single task polls the leaderboard version while there are subscribers,
+    so the database load does not grow with the number of open leaderboards.
+    """
+
+    def __init__(self, cache: LeaderboardCache):
+        self._cache = cache
+        self._condition = asyncio.Condition()
+        self._snapshot: LeaderboardSnapshot | None = None
+        self._subscribers = 0
+        self._task: asyncio.Task | None = None
+
+    async def _poll(self):
+        try:
+            while self._subscribers > 0:
+                try:
+                    async with AsyncSession(async_engine) as session:
+                        snapshot = await self._cache.get(session)
+                except Exception:
+                    logger.exception("Could not refresh the leaderboard")
+                    snapshot = self._snapshot
+                if snapshot is not self._snapshot:
+                    async with self._condition:
+                        self._snapshot = snapshot
+                        self._condition.notify_all()
+                await asyncio.sleep(settings.LEADERBOARD_POLL_SECONDS)
+        finally:
+            # Nothing keeps the snapshot up to date anymore, so the next
+            # subscriber waits for a fresh poll instead of receiving it
+            self._snapshot = None
+
+    async def subscribe(self) -> AsyncIterator[LeaderboardSnapshot | None]:
+        """
+        Yield the current snapshot and then every new one.
+
+        `None` is yielded when nothing changed for `LEADERBOARD_KEEPALIVE_SECONDS`,
+        so the caller can keep the connection alive.
+        """
+        self._subscribers += 1
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._poll())
+        last = None
+        try:
+            while True:
+                async with self._condition:
+                    try:
+                        await asyncio.wait_for(
+                            self._condition.wait_for(
+                                lambda last=last: (
+                                    self._snapshot is not None
+                                    and self._snapshot is not last
+                                )
+                            ),
+                            settings.LEADERBOARD_KEEPALIVE_SECONDS,
+                        )
+                    except TimeoutError:
+                        snapshot = None
+                    else:
+                        snapshot = last = self._snapshot
+                yield snapshot
+        finally:
+            self._subscribers -= 1
+
+
+leaderboard_broadcaster = LeaderboardBroadcaster(leaderboard_cache)
+
+
+async def leaderboard_events() -> AsyncIterator[str]:
+    """
+    Yield server-sent events with the leaderboard entries that changed.
+
+    An `update` event carries the new or changed entries, a `remove` event
+    the ids of teams that disappeared.
+    """
+    shown: dict[int, dict] = {}
+    async for snapshot in leaderboard_broadcaster.subscribe():
+        if snapshot is None:
+            yield ": keep-alive\n\n"
+            continue
+
+        entries = {
+            entry.team_id: {
+                "team_id": entry.team_id,
+                "name": entry.name,
+                "img": entry.img,
+            }
+            for entry in snapshot.entries
+        }
+        updated = [entry for id, entry in entries.items() if shown.get(id) != entry]
+        removed = [id for id in shown if id not in entries]
+        shown = entries
+
+        if updated:
+            yield f"event: update\ndata: {json.dumps(updated)}\n\n"
+        if removed:
+            yield f"event: remove\ndata: {json.dumps(removed)}\n\n"
@@ -1,5 +1,6 @@
 from datetime import datetime
 
+from sqlalchemy import Index
 from sqlmodel import Field, SQLModel
 
 
@@ -57,16 +58,39 @@ class SubmissionCreate(SubmissionBase):
 
 # Database model
 class Submission(SubmissionBase, table=True):
+    __table_args__ = (
+        # Submissions of a team on a question, and all submissions of a team
+        Index(
+            "ix_submission_team_question_timestamp",
+            "team_id",
+            "question_id",
+            "timestamp",
+            "id",
+        ),
+        # Submissions on a question, for resets, rescoring and the feed filter
+        Index("ix_submission_question_timestamp", "question_id", "timestamp", "id"),
+        # The submissions feed and exports, ordered on (timestamp, id)
+        Index("ix_submission_timestamp", "timestamp", "id"),
+    )
+
     id: int = Field(default=None, primary_key=True)
     team_id: int = Field(foreign_key="team.id", ondelete="CASCADE")
     question_id: int = Field(foreign_key="question.id", ondelete="CASCADE")
     timestamp: datetime = Field(default_factory=datetime.now)
+    # Whether the answer matched the solution when it was submitted or last
+    # regraded, the answer itself is already normalized by
+    # validate_question_answer
+    correct: bool = Field(default=False)
 
 
 # Database model
 class Question(QuestionBase, table=True):
     id: int = Field(default=None, primary_key=True)
     solution: str
+    # rendered html of title, body and max_score_display, see prerender_questions
+    title_html: str | None = Field(default=None)
+    body_html: str | None = Field(default=None)
+    max_score_html: str | None = Field(default=None)
 
 
 class QuestionCreate(QuestionBase):
@@ -76,3 +100,17 @@ class QuestionCreate(QuestionBase):
 
 class QuestionPublic(QuestionBase):
     pass
+
+
+# Database model, the score of a team on a question derived from its
+# submissions, kept up to date by app.api.scores
+class TeamQuestionState(SQLModel, table=True):
+    __tablename__ = "team_question_state"  # type: ignore
+
+    team_id: int = Field(foreign_key="team.id", primary_key=True, ondelete="CASCADE")
+    question_id: int = Field(
+        foreign_key="question.id", primary_key=True, ondelete="CASCADE", index=True
+    )
+    attempts: int = Field(default=0)
+    first_correct_at: datetime | None = Field(default=None)
+    score: float = Field(default=0.0)
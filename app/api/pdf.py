@@ -0,0 +1,171 @@
+"""Prebuilt pdf export of the visible questions."""
+
+import asyncio
+import hashlib
+import logging
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from pathlib import Path
+
+from sqlalchemy import func, literal_column
+from sqlalchemy.dialects.postgresql import aggregate_order_by
+from sqlmodel import col, select
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from app.api.models import Question
+from app.api.templates import templates
+from app.core.config import settings
+from app.core.db import async_engine
+from app.core.metrics import timed
+from app.core.render_utils import write_html_to_pdf
+
+# Number of old pdf versions to keep around for clients that are still
+# downloading them
+KEEP_VERSIONS = 8
+
+logger = logging.getLogger(__name__)
+
+# The pdf also changes with its template
+TEMPLATE_HASH = hashlib.sha256(
+    Path("app/templates/questions_pdf.html").read_bytes()
+).hexdigest()
+
+_pool: ProcessPoolExecutor | None = None
+_building: dict[str, asyncio.Future] = {}
+
+
+async def visible_questions(session: AsyncSession) -> list[Question]:
+    return list(
+        (
+            await session.exec(
+                select(Question).where(Question.visible).order_by(Question.number)
+            )
+        ).all()
+    )
+
+
+def questions_pdf_html(questions: list[Question]) -> str:
+    """Render the printable html of `questions`, from their stored html."""
+    html_template = templates.get_template("questions_pdf.html")
+    return html_template.render(sorted_visible_questions=questions)
+
+
+def _shown(html, markdown):
+    """The stored html of a field, or its markdown, like the template shows it."""
+    return func.md5(func.coalesce(func.nullif(html, ""), markdown))
+
+
+async def questions_pdf_version(session: AsyncSession) -> str:
+    """
+    Return the version of the pdf of the visible questions.
+
+    It is computed with a single query over the fields the pdf shows, and
+    the template, without loading or rendering the questions.
+    """
+    fingerprint = (
+        await session.exec(
+            select(
+                func.coalesce(
+                    func.string_agg(
+                        func.concat_ws(
+                            ":",
+                            Question.id,
+                            Question.number,
+                            _shown(Question.title_html, Question.title),
+                            _shown(Question.body_html, Question.body),
+                            _shown(Question.max_score_html, Question.max_score_display),
+                        ),
+                        aggregate_order_by(literal_column("','"), col(Question.number)),
+                    ),
+                    "",
+                )
+            ).where(Question.visible)
+        )
+    ).one()
+    digest = hashlib.sha256(TEMPLATE_HASH.encode() + fingerprint.encode())
+    return digest.hexdigest()[:32]
+
+
+def questions_pdf_path(version: str) -> Path:
+    return Path(settings.PDF_CACHE_DIR) / f"{version}.pdf"
+
+
+def _get_pool() -> ProcessPoolExecutor:
+    global _pool
+    if _pool is None:
+        _pool = ProcessPoolExecutor(
+            max_workers=settings.PDF_WORKERS,
+            mp_context=multiprocessing.get_context("spawn"),
+        )
+    return _pool
+
+
+def shutdown_pdf_pool():
+    global _pool
+    if _pool is not None:
+        _pool.shutdown(cancel_futures=True)
+        _pool = None
+
+
+def _remove_old_versions():
+    pdfs = sorted(
+        Path(settings.PDF_CACHE_DIR).glob("*.pdf"),
+        key=lambda p: p.stat().st_mtime,
+        reverse=True,
+    )
+    for pdf in pdfs[KEEP_VERSIONS:]:
+        pdf.unlink(missing_ok=True)
+
+
+async def _write_pdf(html: str, path: Path):
+    """Write the pdf in the pool, replacing the pool once if it is broken."""
+    loop = asyncio.get_running_loop()
+    pool = _get_pool()
+    try:
+        await loop.run_in_executor(pool, write_html_to_pdf, html, str(path))
+    except BrokenProcessPool:
+        # A worker died, for example when WeasyPrint ran out of memory, and
+        # the pool refuses all work after that. Concurrent builds see the
+        # same error, only the first replaces the pool.
+        if _pool is pool:
+            logger.warning("The pdf worker pool broke, starting a new one")
+            shutdown_pdf_pool()
+        await loop.run_in_executor(_get_pool(), write_html_to_pdf, html, str(path))
+
+
+async def build_questions_pdf(version: str, questions: list[Question]) -> Path:
+    """
+    Return the path of the pdf `version` of `questions`, building it if needed.
+
+    WeasyPrint runs in a worker process so the event loop stays free.
+    Concurrent requests for the same version wait for the same build.
+    """
+    path = questions_pdf_path(version)
+    if path.exists():
+        return path
+
+    if version not in _building:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        html = questions_pdf_html(questions)
+        _building[version] = asyncio.create_task(_write_pdf(html, path))
+    try:
+        # The worker process can't record it in the request itself
+        with timed("weasyprint"):
+            await asyncio.shield(_building[version])
+    finally:
+        _building.pop(version, None)
+    _remove_old_versions()
+    return path
+
+
+async def prebuild_questions_pdf():
+    """Build the pdf of the currently visible questions ahead of requests."""
+    async with AsyncSession(async_engine) as session:
+        # The version is read first, so a concurrent change can only make the
+        # pdf newer than its version, and that change prebuilds its own
+        version = await questions_pdf_version(session)
+        if questions_pdf_path(version).exists():
+            return
+        questions = await visible_questions(session)
+    await build_questions_pdf(version, questions)
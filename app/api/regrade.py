@@ -0,0 +1,87 @@
+"""Set-based regrading of the submissions of a question."""
+
+from dataclasses import dataclass, field
+
+from sqlalchemy import update
+from sqlmodel import col, select
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from app.api.models import Question, Submission, Team, TeamQuestionState
+from app.api.scores import rebuild_team_question_state
+from app.api.utils import answer_correct_clause
+
+
+@dataclass
+class TeamRegrade:
+    team_name: str
+    solved_before: bool
+    solved_after: bool
+    score_before: float
+    score_after: float
+
+
+@dataclass
+class RegradeReport:
+    # Number of submissions whose correctness flips
+    submissions: int
+    # Teams whose result or score on the question changes, ordered by name
+    teams: list[TeamRegrade] = field(default_factory=list)
+
+
+async def question_results(
+    session: AsyncSession, question_id: int
+) -> dict[str, tuple[bool, float]]:
+    """Return whether every team solved `question_id`, and its score on it."""
+    rows = await session.exec(
+        select(
+            Team.name,
+            col(TeamQuestionState.first_correct_at).is_not(None),
+            TeamQuestionState.score,
+        )
+        .join(Team)
+        .where(TeamQuestionState.question_id == question_id)
+    )
+    return {name: (solved, score) for name, solved, score in rows}
+
+
+async def regrade_question(
+    session: AsyncSession, question: Question, dry_run: bool = False
+) -> RegradeReport:
+    """
+    Regrade every submission of `question` against its current solution.
+
+    `question` may hold changes that are not flushed yet. The correctness of
+    the submissions is updated with a single UPDATE that only touches the
+    ones that flip, after which the scores of the question are rebuilt. On a
+    dry run both are rolled back, so only the report of what would change is
+    left. Otherwise the caller commits.
+    """
+    before = await question_results(session, question.id)
+
+    async with session.begin_nested() as savepoint:
+        correct = answer_correct_clause(
+            Submission.answer, question.solution, question.accuracy
+        )
+        result = await session.exec(
+            update(Submission)
+            .where(col(Submission.question_id) == question.id)
+            .where(col(Submission.correct) != correct)
+            .values(correct=correct)
+            .execution_options(synchronize_session=False)
+        )
+        await rebuild_team_question_state(session, question_id=question.id)
+        after = await question_results(session, question.id)
+        if dry_run:
+            await savepoint.rollback()
+
+    report = RegradeReport(result.rowcount)
+    for name in sorted(before.keys() | after.keys()):
+        solved_before, score_before = before.get(name, (False, 0.0))
+        solved_after, score_after = after.get(name, (False, 0.0))
+        if (solved_before, score_before) != (solved_after, score_after):
+            report.teams.append(
+                TeamRegrade(
+                    name, solved_before, solved_after, score_before, score_after
+                )
+            )
+    return report
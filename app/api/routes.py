@@ -1,22 +1,36 @@
-import csv
-import io
+import asyncio
+from collections.abc import AsyncIterator
 from dataclasses import dataclass
 from datetime import datetime, timezone
 from typing import Annotated, Optional
 
 import jwt
-from fastapi import APIRouter, Form, HTTPException, Request, status
+from fastapi import (
+    APIRouter,
+    BackgroundTasks,
+    Form,
+    HTTPException,
+    Path,
+    Request,
+    status,
+)
 from fastapi.responses import (
+    FileResponse,
     HTMLResponse,
+    PlainTextResponse,
     RedirectResponse,
     Response,
+    StreamingResponse,
 )
-from fastapi.templating import Jinja2Templates
+from pydantic import BeforeValidator
 from sqlalchemy import delete, desc, text
 from sqlalchemy.exc import IntegrityError
 from sqlmodel import select
 
 from app.api.deps import AdminDep, AuthDep, AuthOptionalDep, SessionDep
+from app.api.exports import accepts_gzip, answers_csv, gzip_chunks, teams_csv
+from app.api.ingest import submission_batcher
+from app.api.leaderboard import leaderboard_cache, leaderboard_events
 from app.api.models import (
     Question,
     QuestionCreate,
@@ -24,26 +38,44 @@ from app.api.models import (
     SubmissionCreate,
     Team,
     TeamCreate,
+    TeamQuestionState,
+)
+from app.api.pdf import (
+    build_questions_pdf,
+    prebuild_questions_pdf,
+    questions_pdf_html,
+    questions_pdf_path,
+    questions_pdf_version,
+    visible_questions,
 )
+from app.api.regrade import regrade_question
+from app.api.scores import (
+    get_team_question_cells,
+    get_team_scores,
+    rebuild_team_question_state,
+    record_submissions,
+)
+from app.api.submissions import get_submissions_page
+from app.api.team_cache import team_cache
+from app.api.templates import templates
 from app.api.utils import (
-    encoded_logo,
-    generate_logo,
+    LOGO_URL_SCALE,
     generate_password,
-    get_question_score,
-    get_team_quality,
-    get_team_score,
     is_answer_correct,
+    logo_png,
+    logo_quality_bucket,
+    logo_url,
+    prerender_questions,
     validate_question_answer,
 )
+from app.api.warmup import warmup
 from app.core.config import settings
-from app.core.render_utils import render_html_to_pdf, render_md_to_html
+from app.core.db import pool_stats, pool_status
+from app.core.metrics import render_metrics, sample
+from app.core.render_utils import render_cache
 
 router = APIRouter()
 
-templates = Jinja2Templates(directory="app/templates")
-templates.env.globals["now"] = datetime.now
-templates.env.globals["render_md_to_html"] = render_md_to_html
-
 
 @router.get(
     path="/leaderboard",
@@ -54,21 +86,76 @@ async def leaderboard_page(
     session: SessionDep, request: Request, auth: AuthOptionalDep
 ):
     """Render the leaderboard page."""
-    template_teams = []
-    teams = session.exec(
-        select(Team).where(Team.admin == False)  # noqa: E712
-    ).all()
-    for team in teams:
-        quality = get_team_quality(session, team)
-        logo = generate_logo(quality)
-        template_teams.append({"name": team.name, "img": encoded_logo(logo)})
+    leaderboard = await leaderboard_cache.get(session)
     return templates.TemplateResponse(
         request=request,
         name="pages/leaderboard.html",
-        context={"teams": template_teams, "team": auth},
+        context={"teams": leaderboard.entries, "team": auth},
     )
 
 
+@router.get(
+    path="/leaderboard/events",
+    response_class=StreamingResponse,
+    tags=["leaderboard"],
+)
+async def leaderboard_events_stream():
+    """Stream leaderboard changes as server-sent events."""
+    return StreamingResponse(
+        leaderboard_events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+def logo_response(request: Request, quality: int, background=(100, 66, 150)):
+    png, etag = logo_png(logo_quality_bucket(quality / LOGO_URL_SCALE), background)
+    headers = {
+        "ETag": etag,
+        "Cache-Control": "public, max-age=31536000, immutable",
+    }
+    if request.headers.get("if-none-match") == etag:
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+    return Response(content=png, media_type="image/png", headers=headers)
+
+
+@router.get(
+    path="/ready",
+    tags=["health"],
+)
+async def ready(response: Response):
+    """Return whether this worker is done warming up, with status 503 until then."""
+    if not warmup.ready:
+        response.status_code = status.HTTP_503_SERVICE_UNAVAILABLE
+    return {"ready": warmup.ready, "warmup_seconds": warmup.seconds}
+
+
+@router.get(
+    path="/logo/{quality}.png",
+    response_class=Response,
+    tags=["logo"],
+)
+async def logo(
+    request: Request, quality: Annotated[int, Path(ge=0, le=LOGO_URL_SCALE)]
+):
+    """Return the logo degraded to `quality` thousandths."""
+    return logo_response(request, quality)
+
+
+@router.get(
+    path="/logo/{quality}/{background}.png",
+    response_class=Response,
+    tags=["logo"],
+)
+async def logo_background(
+    request: Request,
+    quality: Annotated[int, Path(ge=0, le=LOGO_URL_SCALE)],
+    background: Annotated[str, Path(pattern="^[0-9a-fA-F]{6}$")],
+):
+    """Return the logo degraded to `quality` thousandths on a `background` colour."""
+    return logo_response(request, quality, tuple(bytes.fromhex(background)))
+
+
 @router.get(
     path="/login",
     response_class=HTMLResponse,
@@ -87,8 +174,10 @@ async def login(
     session: SessionDep, name: Annotated[str, Form()], password: Annotated[str, Form()]
 ):
     """Log in and create a JWT."""
-    team = session.exec(
-        select(Team).where(Team.name == name, Team.password == password)
+    team = (
+        await session.exec(
+            select(Team).where(Team.name == name, Team.password == password)
+        )
     ).first()
     if team is None:
         raise HTTPException(
@@ -115,12 +204,19 @@ async def login(
 )
 async def home_page(request: Request, session: SessionDep, auth: AuthDep):
     """Return home page with questions."""
-    questions = session.exec(
-        select(Question).where(Question.visible).order_by(text("Question.number"))
-    ).all()
-    submissions = session.exec(
-        select(Submission).where(Submission.team_id == auth.id)
+    questions = (
+        await session.exec(
+            select(Question).where(Question.visible).order_by(text("Question.number"))
+        )
     ).all()
+    states = {
+        state.question_id: state
+        for state in (
+            await session.exec(
+                select(TeamQuestionState).where(TeamQuestionState.team_id == auth.id)
+            )
+        ).all()
+    }
 
     @dataclass
     class TeamQuestion:
@@ -132,28 +228,15 @@ async def home_page(request: Request, session: SessionDep, auth: AuthDep):
     team_questions: list[TeamQuestion] = []
 
     for question in questions:
-        question_submissions = [s for s in submissions if s.question_id == question.id]
-        solved = bool(
-            next(
-                (
-                    s
-                    for s in question_submissions
-                    if is_answer_correct(s.answer, question.solution, question.accuracy)
-                ),
-                None,
-            )
-        )
-
-        quality = (
-            get_question_score(auth, question, question_submissions)
-            / question.max_score
-        )
-
-        logo = generate_logo(quality, (19, 23, 31))
-
+        state = states.get(question.id)
         team_questions.append(
             TeamQuestion(
-                question, len(question_submissions), solved, encoded_logo(logo)
+                question,
+                state.attempts if state else 0,
+                state is not None and state.first_correct_at is not None,
+                logo_url(
+                    (state.score if state else 0.0) / question.max_score, (19, 23, 31)
+                ),
             )
         )
 
@@ -181,36 +264,22 @@ async def question_show_page(
     submission: Optional[str] = None,
 ):
     """Return the detail page of a question with submission form."""
-    question = session.get(Question, id)
+    question = await session.get(Question, id)
 
     if question is None:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND, detail="question not found"
         )
 
-    submissions = session.exec(
-        select(Submission)
-        .where(Submission.team_id == auth.id, Submission.question_id == question.id)
-        .order_by(desc(Submission.timestamp))
+    submissions = (
+        await session.exec(
+            select(Submission)
+            .where(Submission.team_id == auth.id, Submission.question_id == question.id)
+            .order_by(desc(Submission.timestamp))
+        )
     ).all()
 
-    @dataclass
-    class SubmissionCorrect:
-        timestamp: datetime
-        answer: str
-        correct: bool
-
-    submissions = list(
-        map(
-            lambda s: SubmissionCorrect(
-                s.timestamp,
-                s.answer,
-                is_answer_correct(s.answer, question.solution, question.accuracy),
-            ),
-            submissions,
-        )
-    )
-    solved = any(map(lambda s: s.correct, submissions))
+    solved = any(s.correct for s in submissions)
 
     return templates.TemplateResponse(
         request=request,
@@ -238,7 +307,7 @@ async def question_create_submission(
     submission_in: Annotated[SubmissionCreate, Form()],
 ):
     """Create a new submission."""
-    question = session.get(Question, id)
+    question = await session.get(Question, id)
 
     if question is None:
         raise HTTPException(
@@ -257,10 +326,17 @@ async def question_create_submission(
         answer=answer,
         team_id=auth.id,
         question_id=question.id,
+        correct=is_answer_correct(answer, question.solution, question.accuracy),
     )
 
-    session.add(submission)
-    session.commit()
+    if settings.SUBMISSION_BATCHING:
+        # Release the connection of this request while it waits for its batch
+        await session.commit()
+        await submission_batcher.submit(submission, question)
+    else:
+        session.add(submission)
+        await record_submissions(session, [(submission, question)])
+        await session.commit()
 
     return RedirectResponse(f"/question/{id}", status_code=302)
 
@@ -274,22 +350,25 @@ async def question_delete_submission(
     session: SessionDep, auth: AdminDep, question_id: int, submission_id: int
 ):
     """Delete a submission."""
-    question = session.get(Question, question_id)
+    question = await session.get(Question, question_id)
 
     if question is None:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND, detail="question not found"
         )
 
-    submission = session.get(Submission, submission_id)
+    submission = await session.get(Submission, submission_id)
 
     if submission is None:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND, detail="submission not found"
         )
 
-    session.delete(submission)
-    session.commit()
+    await session.delete(submission)
+    await rebuild_team_question_state(
+        session, team_id=submission.team_id, question_id=submission.question_id
+    )
+    await session.commit()
     return RedirectResponse("/admin", status_code=302)
 
 
@@ -299,24 +378,21 @@ async def question_delete_submission(
 )
 async def questions_pdf(session: SessionDep, auth: AuthDep, request: Request):
     """Return a printable pdf file with all questions."""
-    sorted_visible_questions = session.exec(
-        select(Question).where(Question.visible).order_by(Question.number)
-    ).all()
-    html_template = templates.get_template("questions_pdf.html")
-    html = html_template.render(
-        sorted_visible_questions=sorted_visible_questions,
-        render_md_to_html=render_md_to_html,
-    )
     if "html" in request.query_params:
-        return HTMLResponse(content=html)
-    pdf = render_html_to_pdf(html)
-    return Response(
-        content=pdf,
-        media_type="application/pdf",
-    )
+        return HTMLResponse(
+            content=questions_pdf_html(await visible_questions(session))
+        )
+    version = await questions_pdf_version(session)
+    headers = {"ETag": f'"{version}"', "Cache-Control": "private, no-cache"}
+    if request.headers.get("if-none-match") == headers["ETag"]:
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+    path = questions_pdf_path(version)
+    if not path.exists():
+        # Usually prebuilt when the questions changed
+        path = await build_questions_pdf(version, await visible_questions(session))
+    return FileResponse(path, media_type="application/pdf", headers=headers)
 
 
-# TODO: Optimize function
 @router.get(
     path="/admin",
     response_class=HTMLResponse,
@@ -324,11 +400,12 @@ async def questions_pdf(session: SessionDep, auth: AuthDep, request: Request):
 )
 async def admin_page(request: Request, session: SessionDep, auth: AdminDep):
     """Return admin overview page."""
-    questions = session.exec(select(Question).order_by(text("Question.number"))).all()
-    submissions = session.exec(
-        select(Submission).order_by(desc(text("Submission.timestamp")))
+    questions = (
+        await session.exec(select(Question).order_by(text("Question.number")))
     ).all()
-    teams = session.exec(select(Team).order_by(text("Team.name"))).all()
+    team_scores = await get_team_scores(session)
+    teams = [team for team, _ in team_scores]
+    cells = await get_team_question_cells(session)
 
     # Team submissions table
 
@@ -349,30 +426,8 @@ async def admin_page(request: Request, session: SessionDep, auth: AdminDep):
         team_answer = TeamAnswer(team, [])
 
         for question in questions:
-            question_submissions = [
-                s
-                for s in submissions
-                if s.team_id == team.id and s.question_id == question.id
-            ]
-            correct_submission = next(
-                (
-                    s
-                    for s in question_submissions
-                    if is_answer_correct(s.answer, question.solution, question.accuracy)
-                ),
-                None,
-            )
-            team_answer.questions.append(
-                QuestionAnswer(
-                    question,
-                    len(question_submissions),
-                    True
-                    if correct_submission
-                    else None
-                    if len(question_submissions) == 0
-                    else False,
-                )
-            )
+            attempts, solved = cells.get((team.id, question.id), (0, None))
+            team_answer.questions.append(QuestionAnswer(question, attempts, solved))
 
         team_answers.append(team_answer)
 
@@ -383,48 +438,69 @@ async def admin_page(request: Request, session: SessionDep, auth: AdminDep):
         team: Team
         score: float
 
-    team_scores: list[TeamScore] = []
-
-    for team in teams:
-        team_scores.append(TeamScore(team, get_team_score(session, team, questions)))
+    scoreboard = sorted(
+        (TeamScore(team, score) for team, score in team_scores),
+        key=lambda x: -x.score,
+    )
 
-    team_scores = sorted(team_scores, key=lambda x: -x.score)
+    # Newest submissions, older ones are paged on /admin/submissions
 
-    # All submissions table
+    submissions = await get_submissions_page(session)
 
-    @dataclass
-    class SubmissionPopulated:
-        submission: Submission
-        team: Team
-        question: Question
-        timestamp: str
+    return templates.TemplateResponse(
+        request=request,
+        name="pages/admin.html",
+        context={
+            "team": auth,
+            "answers": team_answers,
+            "questions": questions,
+            "scores": scoreboard,
+            "teams": teams,
+            "submissions": submissions,
+        },
+    )
 
-    submissions_populated: list[SubmissionPopulated] = []
 
-    for s in submissions:
-        team = next((t for t in teams if t.id == s.team_id), None)
-        if not team:
-            continue  # Shouldn't happen
+def empty_as_none(value):
+    """Treat the empty value of an unselected filter as missing."""
+    return value or None
 
-        question = next((q for q in questions if q.id == s.question_id), None)
-        if not question:
-            continue  # Shouldn't happen
 
-        submissions_populated.append(
-            SubmissionPopulated(
-                s, team, question, s.timestamp.strftime("%d-%m-%Y %H:%M:%S")
-            )
+@router.get(
+    path="/admin/submissions",
+    response_class=HTMLResponse,
+    tags=["admin", "submission"],
+)
+async def admin_submissions_page(
+    request: Request,
+    session: SessionDep,
+    auth: AdminDep,
+    team: Annotated[Optional[int], BeforeValidator(empty_as_none)] = None,
+    question: Annotated[Optional[int], BeforeValidator(empty_as_none)] = None,
+    before: Optional[str] = None,
+):
+    """Return a page of submissions, optionally of one team and/or question."""
+    try:
+        submissions = await get_submissions_page(session, team, question, before)
+    except ValueError:
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY, detail="invalid cursor"
         )
+    teams = (await session.exec(select(Team).order_by(text("Team.name")))).all()
+    questions = (
+        await session.exec(select(Question).order_by(text("Question.number")))
+    ).all()
 
     return templates.TemplateResponse(
         request=request,
-        name="pages/admin.html",
+        name="pages/admin_submissions.html",
         context={
             "team": auth,
-            "answers": team_answers,
+            "teams": teams,
             "questions": questions,
-            "scores": team_scores,
-            "submissions": submissions_populated,
+            "submissions": submissions,
+            "filter_team": team,
+            "filter_question": question,
         },
     )
 
@@ -436,7 +512,7 @@ async def admin_page(request: Request, session: SessionDep, auth: AdminDep):
 )
 async def admin_team_page(request: Request, auth: AdminDep, session: SessionDep):
     """Return admin teams overview page."""
-    teams = session.exec(select(Team)).all()
+    teams = (await session.exec(select(Team))).all()
 
     return templates.TemplateResponse(
         request=request,
@@ -474,7 +550,7 @@ async def admin_team_create(
 
     try:
         session.add(team)
-        session.commit()
+        await session.commit()
     except IntegrityError:
         raise HTTPException(
             status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
@@ -493,7 +569,7 @@ async def admin_team_show_page(
     request: Request, session: SessionDep, id: int, auth: AdminDep
 ):
     """Return detail page of team, only admins have access."""
-    team = session.get(Team, id)
+    team = await session.get(Team, id)
     if team is None:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND, detail="question not found"
@@ -515,14 +591,14 @@ async def admin_team_delete(
     request: Request, session: SessionDep, id: int, auth: AdminDep
 ):
     """Delete A team."""
-    team = session.get(Team, id)
+    team = await session.get(Team, id)
     if team is None:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND, detail="team not found"
         )
 
-    session.delete(team)
-    session.commit()
+    await session.delete(team)
+    await session.commit()
 
     return RedirectResponse("/admin/team", status_code=302)
 
@@ -534,7 +610,9 @@ async def admin_team_delete(
 )
 async def admin_question_page(request: Request, auth: AdminDep, session: SessionDep):
     """Return admin questions overview page."""
-    questions = session.exec(select(Question).order_by(text("Question.number"))).all()
+    questions = (
+        await session.exec(select(Question).order_by(text("Question.number")))
+    ).all()
 
     return templates.TemplateResponse(
         request=request,
@@ -564,7 +642,7 @@ async def admin_question_show_page(
     session: SessionDep, request: Request, auth: AdminDep, id: int
 ):
     """Render the question form page for updating."""
-    question = session.get(Question, id)
+    question = await session.get(Question, id)
 
     if question is None:
         raise HTTPException(
@@ -590,6 +668,7 @@ async def admin_question_create(
     session: SessionDep,
     auth: AdminDep,
     question_in: Annotated[QuestionCreate, Form()],
+    background_tasks: BackgroundTasks,
 ):
     """Create the new question and redirect to admin home page."""
     answer = validate_question_answer(question_in.solution)
@@ -606,16 +685,20 @@ async def admin_question_create(
         )
 
     question = Question.model_validate(question_in, update={"solution": answer})
+    # Pandoc and MathJax block, so keep them off the event loop
+    await asyncio.to_thread(prerender_questions, [question])
 
     try:
         session.add(question)
-        session.commit()
+        await session.commit()
     except IntegrityError:
         raise HTTPException(
             status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
             detail="question number already exists",
         )
 
+    background_tasks.add_task(prebuild_questions_pdf)
+
     return RedirectResponse("/admin/question", status_code=302)
 
 
@@ -629,9 +712,16 @@ async def admin_question_update(
     auth: AdminDep,
     id: int,
     question_in: Annotated[QuestionCreate, Form()],
+    background_tasks: BackgroundTasks,
+    dry_run: bool = False,
 ):
-    """Create the new question and redirect to admin home page."""
-    question = session.get(Question, id)
+    """
+    Update the question and redirect to admin home page.
+
+    With `dry_run`, show which teams' results and scores the update would
+    change instead of saving it.
+    """
+    question = await session.get(Question, id)
 
     if question is None:
         raise HTTPException(
@@ -658,9 +748,22 @@ async def admin_question_update(
 
     for key, value in update_data.items():
         setattr(question, key, value)
-
+    # Pandoc and MathJax block, so keep them off the event loop
+    await asyncio.to_thread(prerender_questions, [question])
     session.add(question)
-    session.commit()
+
+    # The correctness or score of submissions may have changed
+    report = await regrade_question(session, question, dry_run=dry_run)
+    if dry_run:
+        # Nothing is committed, closing the session discards the update
+        return templates.TemplateResponse(
+            request=request,
+            name="pages/admin_question_update.html",
+            context={"question": question, "team": auth, "regrade": report},
+        )
+    await session.commit()
+
+    background_tasks.add_task(prebuild_questions_pdf)
 
     return RedirectResponse("/admin/question", status_code=302)
 
@@ -670,17 +773,21 @@ async def admin_question_update(
     response_class=RedirectResponse,
     tags=["admin", "question"],
 )
-async def admin_question_delete(session: SessionDep, auth: AdminDep, id: int):
+async def admin_question_delete(
+    session: SessionDep, auth: AdminDep, id: int, background_tasks: BackgroundTasks
+):
     """Remove this question."""
-    question = session.get(Question, id)
+    question = await session.get(Question, id)
 
     if question is None:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND, detail="question not found"
         )
 
-    session.delete(question)
-    session.commit()
+    await session.delete(question)
+    await session.commit()
+
+    background_tasks.add_task(prebuild_questions_pdf)
 
     return RedirectResponse("/admin/question", status_code=302)
 
@@ -692,72 +799,123 @@ async def admin_question_delete(session: SessionDep, auth: AdminDep, id: int):
 )
 async def admin_question_reset(session: SessionDep, auth: AdminDep, id: int):
     """Delete all submissions for this question."""
-    question = session.get(Question, id)
+    question = await session.get(Question, id)
 
     if question is None:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND, detail="question not found"
         )
 
-    session.exec(delete(Submission).where(Submission.question_id == question.id))
-    session.commit()
+    await session.exec(delete(Submission).where(Submission.question_id == question.id))
+    await rebuild_team_question_state(session, question_id=question.id)
+    await session.commit()
 
     return RedirectResponse("/admin/question", status_code=302)
 
 
+def csv_response(request: Request, chunks: AsyncIterator[bytes]) -> StreamingResponse:
+    """Stream a csv export, gzipped when the client accepts it."""
+    headers = {"Vary": "Accept-Encoding"}
+    if accepts_gzip(request.headers.get("accept-encoding", "")):
+        chunks = gzip_chunks(chunks)
+        headers["Content-Encoding"] = "gzip"
+    return StreamingResponse(chunks, media_type="text/csv", headers=headers)
+
+
 @router.get(
     path="/admin/teams.csv",
     tags=["admin", "export"],
 )
-async def admin_teams_csv(request: Request, session: SessionDep, auth: AdminDep):
+async def admin_teams_csv(request: Request, auth: AdminDep):
     """Return a CSV with the number of attempts of teams."""
-    teams = session.exec(select(Team)).all()
-    questions = session.exec(select(Question)).all()
-    output = io.StringIO()
-    writer = csv.writer(output)
-    header = ["Team Name"]
-    for i in questions:
-        header.append(f"Question #{i.number}")
-    writer.writerow(header)
-    for i in teams:
-        row = [i.name]
-        for j in questions:
-            submissions = session.exec(
-                select(Submission).where(
-                    Submission.team_id == i.id, Submission.question_id == j.id
-                )
-            ).all()
-            row.append(str(len(submissions)))
-        writer.writerow(row)
-
-    return Response(content=output.getvalue(), media_type="text/csv")
+    return csv_response(request, teams_csv())
 
 
 @router.get(
     path="/admin/answers.csv",
     tags=["admin", "export"],
 )
-async def admin_answers_csv(request: Request, session: SessionDep, auth: AdminDep):
+async def admin_answers_csv(request: Request, auth: AdminDep):
     """Return a CSV with all answers."""
-    submissions = session.exec(select(Submission)).all()
-    output = io.StringIO()
-    writer = csv.writer(output)
-    writer.writerow(["Timestamp", "Team Name", "Question Number", "Answer", "Correct"])
-    for i in submissions:
-        team = session.get(Team, i.team_id)
-        assert team is not None
-        team_name = team.name
-        question = session.get(Question, i.question_id)
-        assert question is not None
-        question_no = question.number
-        writer.writerow(
-            [
-                i.timestamp.strftime("%x %X"),
-                team_name,
-                question_no,
-                i.answer,
-                is_answer_correct(question.solution, i.answer, question.accuracy),
-            ]
-        )
+    return csv_response(request, answers_csv())
+
+
+@router.get(
+    path="/admin/pool",
+    tags=["admin", "metrics"],
+)
+async def admin_pool(session: SessionDep, auth: AdminDep):
+    """Return the connection pool state of the worker handling the request."""
+    return await pool_status(session)
+
+
+@router.get(
+    path="/admin/caches",
+    tags=["admin", "metrics"],
+)
+async def admin_caches(auth: AdminDep):
+    """Return the hit counters of the caches of the worker handling the request."""
+    return {
+        "auth": team_cache.stats(),
+        "render": {
+            "hits": render_cache.hits,
+            "misses": render_cache.misses,
+            "evictions": render_cache.evictions,
+        },
+    }
+
 
-    return Response(content=output.getvalue(), media_type="text/csv")
+@router.get(
+    path="/admin/metrics",
+    tags=["admin", "metrics"],
+    response_class=PlainTextResponse,
+)
+async def admin_metrics(auth: AdminDep):
+    """Return the metrics of the worker handling the request, for Prometheus."""
+    extra = [
+        *sample(
+            "coma_db_connections_checked_out",
+            "Connections checked out of the pool.",
+            "gauge",
+            pool_stats.checked_out,
+        ),
+        *sample(
+            "coma_db_checkout_wait_seconds_total",
+            "Time spent waiting for a connection from the pool.",
+            "counter",
+            pool_stats.wait_seconds_total,
+        ),
+        *sample(
+            "coma_db_checkout_timeouts_total",
+            "Checkouts that timed out waiting for a connection.",
+            "counter",
+            pool_stats.timeouts,
+        ),
+        *sample(
+            "coma_auth_cache_hits_total",
+            "Authenticated teams found in the cache.",
+            "counter",
+            team_cache.hits,
+        ),
+        *sample(
+            "coma_auth_cache_misses_total",
+            "Authenticated teams loaded from the database.",
+            "counter",
+            team_cache.misses,
+        ),
+        *sample(
+            "coma_render_cache_hits_total",
+            "Renders found in the on-disk cache.",
+            "counter",
+            render_cache.hits,
+        ),
+        *sample(
+            "coma_render_cache_misses_total",
+            "Renders missing from the on-disk cache.",
+            "counter",
+            render_cache.misses,
+        ),
+    ]
+    return PlainTextResponse(
+        render_metrics(extra), media_type="text/plain; version=0.0.4"
+    )
@@ -0,0 +1,160 @@
+"""Maintenance of the `team_question_state` table."""
+
+from sqlalchemy import case, delete, func, literal_column
+from sqlalchemy.dialects.postgresql import insert
+from sqlmodel import col, select
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from app.api.models import Question, Submission, Team, TeamQuestionState
+from app.api.utils import ATTEMPT_PENALTY
+
+
+async def record_submissions(
+    session: AsyncSession, submissions: list[tuple[Submission, Question]]
+):
+    """
+    Count the new `submissions`, with their question, in the state of their
+    team and question.
+
+    This is a single upsert, so concurrent submissions of the same team
+    don't lose attempts. Submissions of the same team and question are
+    counted in one row, as an upsert can't change a row twice. It runs in
+    the transaction of the caller, which commits it together with the
+    submissions.
+    """
+    rows: dict[tuple[int, int], dict] = {}
+    for submission, question in submissions:
+        row = rows.setdefault(
+            (submission.team_id, submission.question_id),
+            {
+                "team_id": submission.team_id,
+                "question_id": submission.question_id,
+                "attempts": 0,
+                "first_correct_at": None,
+                "score": 0.0,
+            },
+        )
+        row["attempts"] += 1
+        if submission.correct:
+            row["first_correct_at"] = min(
+                row["first_correct_at"] or submission.timestamp, submission.timestamp
+            )
+        if row["first_correct_at"] is not None:
+            row["score"] = ATTEMPT_PENALTY ** (row["attempts"] - 1) * question.max_score
+
+    # Lock the rows in the same order in every transaction, so concurrent
+    # batches wait for each other instead of deadlocking
+    statement = insert(TeamQuestionState).values([rows[key] for key in sorted(rows)])
+    attempts = TeamQuestionState.attempts + statement.excluded.attempts
+    first_correct_at = func.coalesce(
+        TeamQuestionState.first_correct_at, statement.excluded.first_correct_at
+    )
+    # Spelled out, as SQLAlchemy would add `excluded` to the FROM of the subquery
+    max_score = (
+        select(Question.max_score)
+        .where(Question.id == literal_column("excluded.question_id"))
+        .scalar_subquery()
+    )
+    statement = statement.on_conflict_do_update(
+        index_elements=[TeamQuestionState.team_id, TeamQuestionState.question_id],
+        set_={
+            "attempts": attempts,
+            "first_correct_at": first_correct_at,
+            "score": case(
+                (
+                    first_correct_at.is_not(None),
+                    func.power(ATTEMPT_PENALTY, attempts - 1) * max_score,
+                ),
+                else_=0.0,
+            ),
+        },
+    )
+    await session.exec(statement)
+
+
+async def rebuild_team_question_state(
+    session: AsyncSession,
+    team_id: int | None = None,
+    question_id: int | None = None,
+) -> int:
+    """
+    Recompute the state from the raw submissions and return the number of rows.
+
+    Only the rows of `team_id` and/or `question_id` are rebuilt when given,
+    for example after deleting a submission or regrading a question. This is
+    a single INSERT ... SELECT over the stored correctness of the submissions.
+    Like `record_submissions`, the caller commits.
+    """
+    attempts = func.count()
+    rows = (
+        select(
+            Submission.team_id,
+            Submission.question_id,
+            attempts,
+            func.min(Submission.timestamp).filter(col(Submission.correct)),
+            case(
+                (
+                    func.bool_or(Submission.correct),
+                    func.power(ATTEMPT_PENALTY, attempts - 1) * Question.max_score,
+                ),
+                else_=0.0,
+            ),
+        )
+        .join(Question)
+        .group_by(
+            col(Submission.team_id), col(Submission.question_id), Question.max_score
+        )
+    )
+    delete_query = delete(TeamQuestionState)
+    if team_id is not None:
+        rows = rows.where(Submission.team_id == team_id)
+        delete_query = delete_query.where(TeamQuestionState.team_id == team_id)
+    if question_id is not None:
+        rows = rows.where(Submission.question_id == question_id)
+        delete_query = delete_query.where(TeamQuestionState.question_id == question_id)
+
+    await session.exec(delete_query)
+    result = await session.exec(
+        insert(TeamQuestionState).from_select(
+            ["team_id", "question_id", "attempts", "first_correct_at", "score"], rows
+        )
+    )
+    return result.rowcount
+
+
+async def get_team_scores(session: AsyncSession) -> list[tuple[Team, float]]:
+    """Return every team, ordered by name, with its total score."""
+    score = func.coalesce(func.sum(TeamQuestionState.score), 0.0)
+    return list(
+        (
+            await session.exec(
+                select(Team, score)
+                .outerjoin(TeamQuestionState)
+                .group_by(col(Team.id))
+                .order_by(Team.name)
+            )
+        ).all()
+    )
+
+
+async def get_team_question_cells(
+    session: AsyncSession,
+) -> dict[tuple[int, int], tuple[int, bool]]:
+    """
+    Return the attempts and solved state of every team on every question.
+
+    Cells are keyed by `(team_id, question_id)`, teams without submissions on
+    a question have no cell.
+    """
+    rows = await session.exec(
+        select(
+            TeamQuestionState.team_id,
+            TeamQuestionState.question_id,
+            TeamQuestionState.attempts,
+            col(TeamQuestionState.first_correct_at).is_not(None),
+        )
+    )
+    return {
+        (team_id, question_id): (attempts, solved)
+        for team_id, question_id, attempts, solved in rows
+    }
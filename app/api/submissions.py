@@ -0,0 +1,83 @@
+"""Keyset-paginated feed of submissions for admins."""
+
+from dataclasses import dataclass
+from datetime import datetime
+
+from sqlalchemy import tuple_
+from sqlmodel import col, select
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from app.api.models import Question, Submission, Team
+
+SUBMISSIONS_PAGE_SIZE = 50
+
+
+@dataclass
+class SubmissionRow:
+    submission: Submission
+    team_name: str
+    question_number: int
+    timestamp: str
+
+
+@dataclass
+class SubmissionsPage:
+    rows: list[SubmissionRow]
+    # Cursor of the next, older, page or None if this is the last one
+    next_cursor: str | None
+
+
+def encode_cursor(submission: Submission) -> str:
+    return f"{submission.timestamp.isoformat()},{submission.id}"
+
+
+def decode_cursor(cursor: str) -> tuple[datetime, int]:
+    """Return the `(timestamp, id)` in `cursor`, raises ValueError if invalid."""
+    timestamp, _, id = cursor.rpartition(",")
+    return datetime.fromisoformat(timestamp), int(id)
+
+
+async def get_submissions_page(
+    session: AsyncSession,
+    team_id: int | None = None,
+    question_id: int | None = None,
+    before: str | None = None,
+) -> SubmissionsPage:
+    """
+    Return the newest submissions older than the `before` cursor.
+
+    Submissions are ordered on `(timestamp, id)`, so a page only reads its own
+    rows however far back it is.
+    """
+    query = (
+        select(Submission, Team.name, Question.number)
+        .join(Team)
+        .join(Question)
+        .order_by(col(Submission.timestamp).desc(), col(Submission.id).desc())
+        .limit(SUBMISSIONS_PAGE_SIZE + 1)
+    )
+    if team_id is not None:
+        query = query.where(Submission.team_id == team_id)
+    if question_id is not None:
+        query = query.where(Submission.question_id == question_id)
+    if before is not None:
+        query = query.where(
+            tuple_(Submission.timestamp, Submission.id) < tuple_(*decode_cursor(before))
+        )
+
+    results = (await session.exec(query)).all()
+    rows = [
+        SubmissionRow(
+            submission,
+            team_name,
+            question_number,
+            submission.timestamp.strftime("%d-%m-%Y %H:%M:%S"),
+        )
+        for submission, team_name, question_number in results[:SUBMISSIONS_PAGE_SIZE]
+    ]
+    next_cursor = (
+        encode_cursor(rows[-1].submission)
+        if len(results) > SUBMISSIONS_PAGE_SIZE
+        else None
+    )
+    return SubmissionsPage(rows, next_cursor)
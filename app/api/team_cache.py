@@ -0,0 +1,98 @@
+"""Short-lived in-process cache of authenticated teams."""
+
+import time
+
+from sqlalchemy import event
+from sqlalchemy.orm import Session, object_session
+from sqlalchemy.orm.attributes import get_history
+
+from app.api.models import Team
+from app.core.config import settings
+
+
+class TeamCache:
+    """
+    Keep the teams that authenticated recently, keyed by their id.
+
+    Every worker has its own cache, so a team that is deleted or loses its
+    admin flag in another worker is only forgotten here after `ttl`
+    seconds. Changes made in this worker drop the entry once they are
+    committed.
+
+    `set` takes the `generation` read before loading the team, and skips
+    teams that were loaded before an invalidation, which could still be the
+    old row.
+    """
+
+    def __init__(self, ttl: float):
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+        self.generation = 0
+        self._teams: dict[int, tuple[float, Team]] = {}
+
+    def get(self, id: int) -> Team | None:
+        entry = self._teams.get(id)
+        if entry is None or entry[0] < time.monotonic():
+            self.misses += 1
+            return None
+        self.hits += 1
+        return entry[1]
+
+    def set(self, team: Team, generation: int):
+        if self.ttl > 0 and generation == self.generation:
+            # A copy, so it doesn't belong to the session of this request
+            copy = Team.model_validate(team)
+            self._teams[team.id] = (time.monotonic() + self.ttl, copy)
+
+    def invalidate(self, id: int):
+        self.generation += 1
+        if self._teams.pop(id, None) is not None:
+            self.invalidations += 1
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self._teams),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "invalidations": self.invalidations,
+        }
+
+
+team_cache = TeamCache(settings.AUTH_CACHE_SECONDS)
+
+
+# Ids of the teams a session changed, evicted when it commits. Evicting at
+# flush time would let a concurrent request cache the old row again.
+INVALIDATED_TEAMS = "invalidated_teams"
+
+
+def _invalidate_on_commit(team: Team):
+    session = object_session(team)
+    if session is not None:
+        session.info.setdefault(INVALIDATED_TEAMS, set()).add(team.id)
+
+
+@event.listens_for(Team, "after_update")
+def invalidate_updated_team(mapper, connection, team: Team):
+    if get_history(team, "admin").has_changes():
+        _invalidate_on_commit(team)
+
+
+@event.listens_for(Team, "after_delete")
+def invalidate_deleted_team(mapper, connection, team: Team):
+    _invalidate_on_commit(team)
+
+
+@event.listens_for(Session, "after_commit")
+def evict_invalidated_teams(session: Session):
+    for id in session.info.pop(INVALIDATED_TEAMS, ()):
+        team_cache.invalidate(id)
+
+
+@event.listens_for(Session, "after_rollback")
+def forget_invalidated_teams(session: Session):
+    session.info.pop(INVALIDATED_TEAMS, None)
@@ -0,0 +1,17 @@
+from datetime import datetime
+
+from fastapi.templating import Jinja2Templates
+
+from app.core.metrics import timed
+
+
+class TimedTemplates(Jinja2Templates):
+    """Templates whose rendering is timed as the template phase of a request."""
+
+    def TemplateResponse(self, *args, **kwargs):
+        with timed("template"):
+            return super().TemplateResponse(*args, **kwargs)
+
+
+templates = TimedTemplates(directory="app/templates")
+templates.env.globals["now"] = datetime.now
@@ -1,16 +1,26 @@
 import base64
+import hashlib
 import io
 import random
 import re
 import secrets
-import textwrap
+from dataclasses import dataclass
+from functools import lru_cache
 from typing import List
 
+import numpy as np
 from PIL import Image
-from sqlmodel import select
+from sqlalchemy import ColumnElement, and_, func, or_
+from sqlmodel import col, select
 
 from app.api.deps import SessionDep
-from app.api.models import Question, Submission, Team
+from app.api.models import Question, Submission, Team, TeamQuestionState
+from app.core.config import settings
+from app.core.metrics import timed
+from app.core.render_utils import render_md_to_html_batch
+
+# Fraction of the score that is left after each wrong attempt
+ATTEMPT_PENALTY = 0.9
 
 
 def generate_password() -> str:
@@ -22,28 +32,31 @@ def get_question_score(
 ) -> float:
     for submission in question_submissions:
         assert submission.question_id == question.id
-        if is_answer_correct(submission.answer, question.solution, question.accuracy):
-            return 0.9 ** (len(question_submissions) - 1) * question.max_score
+        if submission.correct:
+            return (
+                ATTEMPT_PENALTY ** (len(question_submissions) - 1) * question.max_score
+            )
 
     return 0.0
 
 
-def get_team_score(session: SessionDep, team: Team, questions: List[Question]) -> float:
-    score = 0
-    all_submissions = session.exec(
-        select(Submission).where(Submission.team_id == team.id)
-    ).all()
-
-    for question in questions:
-        submissions = [s for s in all_submissions if s.question_id == question.id]
-        score += get_question_score(team, question, submissions)
-
-    return score
+async def get_team_score(
+    session: SessionDep, team: Team, questions: List[Question]
+) -> float:
+    """Sum the scores of `team` on `questions`, from the team_question_state table."""
+    return (
+        await session.exec(
+            select(func.coalesce(func.sum(TeamQuestionState.score), 0.0)).where(
+                TeamQuestionState.team_id == team.id,
+                col(TeamQuestionState.question_id).in_([q.id for q in questions]),
+            )
+        )
+    ).one()
 
 
-def get_team_quality(session: SessionDep, team: Team) -> float:
-    questions = session.exec(select(Question)).all()
-    score = get_team_score(session, team, questions)
+async def get_team_quality(session: SessionDep, team: Team) -> float:
+    questions = (await session.exec(select(Question))).all()
+    score = await get_team_score(session, team, questions)
 
     max_score = sum(x.max_score for x in questions)
 
@@ -53,42 +66,165 @@ def get_team_quality(session: SessionDep, team: Team) -> float:
         return 1
 
 
+@dataclass
+class QuestionHtml:
+    title: str
+    body: str
+    max_score: str
+
+
+def render_questions_html(questions: List[Question]) -> List[QuestionHtml]:
+    """
+    Render the title, body and score of all `questions`, each on its own.
+
+    All fields are rendered together with `render_md_to_html_batch`.
+    """
+    htmls = render_md_to_html_batch(
+        [
+            fragment
+            for question in questions
+            for fragment in [
+                (question.title, True),
+                (question.body, False),
+                (f"${question.max_score_display}$", True),
+            ]
+        ]
+    )
+    return [QuestionHtml(*htmls[i : i + 3]) for i in range(0, len(htmls), 3)]
+
+
+def prerender_questions(questions: List[Question]):
+    """Store the rendered html of `questions` alongside their markdown."""
+    for question, html in zip(questions, render_questions_html(questions)):
+        question.title_html = html.title
+        question.body_html = html.body
+        question.max_score_html = html.max_score
+
+
 def question_score_left(
     question: Question, question_submissions: List[Submission]
 ) -> float:
-    return 0.9 ** len(question_submissions) * question.max_score
+    return ATTEMPT_PENALTY ** len(question_submissions) * question.max_score
+
+
+class LogoDegrader:
+    """
+    Degrade an image by replacing a random subset of its pixels.
+
+    The noise field is drawn once from `random.Random(seed)` in the same
+    column-major order as the original per-pixel loop, so every logo is a
+    single vectorized threshold of that field against the quality.
+    """
+
+    def __init__(self, img: Image.Image, seed: int = 1):
+        self.pixels = np.asarray(img)
+        height, width = self.pixels.shape[:2]
+        rng = random.Random(seed)
+        noise = np.fromiter(
+            (rng.random() for _ in range(width * height)),
+            dtype=np.float64,
+            count=width * height,
+        )
+        self.noise = noise.reshape(width, height).T
+
+    def degrade(self, quality: float, background=(100, 66, 150)) -> Image.Image:
+        fill = np.array(background, dtype=self.pixels.dtype)
+        if self.pixels.ndim == 3 and len(fill) < self.pixels.shape[2]:
+            # PIL pads a short colour tuple with an opaque alpha channel
+            fill = np.append(fill, 255).astype(self.pixels.dtype)
+        pixels = self.pixels.copy()
+        pixels[self.noise > quality] = fill
+        return Image.fromarray(pixels)
+
+
+@lru_cache(maxsize=1)
+def logo_degrader() -> LogoDegrader:
+    return LogoDegrader(Image.open("app/static/images/prime.webp"))
 
 
 def generate_logo(quality: float, background=(100, 66, 150)) -> Image.Image:
-    img = Image.open("app/static/images/prime.webp")
-    width, height = img.size
-    random.seed(1)
-    pixels = img.load()
-    assert pixels is not None
-    for x in range(width):
-        for y in range(height):
-            if random.random() > quality:
-                pixels[x, y] = background
-    return img
+    with timed("logo"):
+        return logo_degrader().degrade(quality, background)
 
 
 def encoded_logo(logo: Image.Image) -> str:
+    with timed("logo"):
+        bytes = io.BytesIO()
+        logo.save(bytes, format="PNG")
+        return base64.b64encode(bytes.getvalue()).decode()
+
+
+# Logo qualities in urls are expressed in thousandths
+LOGO_URL_SCALE = 1000
+
+
+def logo_quality_bucket(quality: float) -> float:
+    """Round `quality` to the configured logo resolution."""
+    steps = settings.LOGO_QUALITY_STEPS
+    return min(steps, max(0, round(quality * steps))) / steps
+
+
+def logo_url(quality: float, background: tuple[int, int, int] | None = None) -> str:
+    """Return the url of the logo image for `quality`."""
+    quality_in_url = round(logo_quality_bucket(quality) * LOGO_URL_SCALE)
+    if background is None:
+        return f"/logo/{quality_in_url}.png"
+    return f"/logo/{quality_in_url}/{bytes(background).hex()}.png"
+
+
+@lru_cache(maxsize=1024)
+def logo_png(quality: float, background=(100, 66, 150)) -> tuple[bytes, str]:
+    """Return the png encoded logo for `quality` together with its ETag."""
     bytes = io.BytesIO()
-    logo.save(bytes, format="PNG")
-    return base64.b64encode(bytes.getvalue()).decode()
+    logo = generate_logo(logo_quality_bucket(quality), background)
+    with timed("logo"):
+        logo.save(bytes, format="PNG")
+    png = bytes.getvalue()
+    return png, f'"{hashlib.sha256(png).hexdigest()[:32]}"'
 
 
 def is_answer_correct(a: str, b: str, accuracy: int = 10) -> bool:
-    if "." not in a and a == b:
-        return True
-    if a.count(".") == 1 and b.count(".") == 1:
-        split_a = a.split(".")
-        split_b = b.split(".")
-        after_decimal_a = textwrap.wrap(split_a[1], accuracy)[0]
-        after_decimal_b = textwrap.wrap(split_b[1], accuracy)[0]
-        if split_a[0] == split_b[0] and after_decimal_a == after_decimal_b:
-            return True
-    return False
+    """
+    Return whether answer `a` matches solution `b`.
+
+    Numbers without a point must be equal, otherwise both need exactly one
+    point, equal integer parts and equal first `accuracy` decimals. This
+    compares positions in the strings instead of splitting them, as it runs
+    for every submission of a question on a regrade. `answer_correct_clause`
+    is the same check in SQL.
+    """
+    point = a.find(".")
+    if point < 0:
+        return a == b
+    if (
+        b.find(".") != point
+        or a.find(".", point + 1) >= 0
+        or b.find(".", point + 1) >= 0
+    ):
+        return False
+    end = point + 1 + accuracy
+    if len(a) > end and len(b) > end:
+        return a.startswith(b[:end])
+    # One of them ends within the decimals that count, so both must end there
+    if min(len(a), end) != min(len(b), end):
+        return False
+    return a.startswith(b) if len(b) <= len(a) else b.startswith(a)
+
+
+def answer_correct_clause(answer, solution, accuracy) -> ColumnElement[bool]:
+    """The SQL version of `is_answer_correct`, for set-based regrades."""
+    point = func.strpos(answer, ".")
+    return or_(
+        and_(point == 0, answer == solution),
+        and_(
+            point > 0,
+            func.strpos(solution, ".") == point,
+            func.strpos(func.substr(answer, point + 1), ".") == 0,
+            func.strpos(func.substr(solution, point + 1), ".") == 0,
+            func.left(answer, point + accuracy)
+            == func.left(solution, point + accuracy),
+        ),
+    )
 
 
 def validate_question_answer(input: str) -> str | None:
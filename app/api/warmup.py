@@ -0,0 +1,100 @@
+"""Warm-up of a worker before it reports itself ready."""
+
+import asyncio
+import logging
+import time
+
+from sqlalchemy import update
+from sqlmodel import col
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from app.api.models import Question
+from app.api.pdf import prebuild_questions_pdf, visible_questions
+from app.api.templates import templates
+from app.api.utils import render_questions_html
+from app.core.config import settings
+from app.core.db import async_engine
+
+logger = logging.getLogger(__name__)
+
+
+def compile_templates() -> int:
+    """Compile every template into the cache of the environment."""
+    names = templates.env.list_templates(extensions=["html"])
+    for name in names:
+        templates.get_template(name)
+    return len(names)
+
+
+async def render_visible_questions() -> int:
+    """
+    Render the title, body and score of the visible questions.
+
+    This fills the render caches and starts pandoc and MathJax. Html is
+    only stored where it is missing, so html that is already stored is
+    never replaced, and workers warming up together write the same values.
+    """
+    async with AsyncSession(async_engine) as session:
+        questions = await visible_questions(session)
+        htmls = await asyncio.to_thread(render_questions_html, questions)
+        for question, html in zip(questions, htmls):
+            for column, value in [
+                (Question.title_html, html.title),
+                (Question.body_html, html.body),
+                (Question.max_score_html, html.max_score),
+            ]:
+                if getattr(question, column.key) is None:
+                    await session.exec(
+                        update(Question)
+                        .where(col(Question.id) == question.id, col(column).is_(None))
+                        .values({column: value})
+                    )
+        await session.commit()
+    return len(questions)
+
+
+class Warmup:
+    """
+    Warm the caches of this worker in the background after it starts.
+
+    The templates are compiled, the visible questions rendered and, with
+    `WARMUP_QUESTIONS_PDF`, the questions pdf built, so the first requests
+    don't pay for it. `ready` becomes true once that is done, even if it
+    failed, because the worker can still serve requests without it.
+    """
+
+    def __init__(self):
+        self.ready = False
+        self.seconds: float | None = None
+        self._task: asyncio.Task | None = None
+
+    def start(self):
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+
+    async def _run(self):
+        start = time.perf_counter()
+        try:
+            templates_count = await asyncio.to_thread(compile_templates)
+            questions_count = await render_visible_questions()
+            if settings.WARMUP_QUESTIONS_PDF:
+                await prebuild_questions_pdf()
+            logger.info(
+                f"Compiled {templates_count} templates and rendered"
+                f" {questions_count} questions"
+            )
+        except Exception:
+            logger.exception("Could not warm up")
+        finally:
+            self.seconds = time.perf_counter() - start
+            self.ready = True
+
+
+warmup = Warmup()
@@ -0,0 +1,109 @@
+"""
+Maintenance commands.
+
+Run with:
+
+    python -m app.commands <command>
+"""
+
+import argparse
+import asyncio
+
+from sqlmodel import Session, or_, select
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from app.api.models import Question
+from app.api.regrade import regrade_question
+from app.api.scores import rebuild_team_question_state
+from app.api.utils import prerender_questions
+from app.core.db import async_engine, engine
+
+
+def backfill_question_html(all: bool):
+    """Render the stored html of questions that don't have it yet."""
+    with Session(engine) as session:
+        query = select(Question)
+        if not all:
+            query = query.where(
+                or_(
+                    Question.title_html == None,  # noqa: E711
+                    Question.body_html == None,  # noqa: E711
+                    Question.max_score_html == None,  # noqa: E711
+                )
+            )
+        questions = list(session.exec(query).all())
+        prerender_questions(questions)
+        session.add_all(questions)
+        session.commit()
+        print(f"Rendered {len(questions)} question(s)")
+
+
+async def rebuild_scores():
+    """Recompute the team_question_state table from all submissions."""
+    async with AsyncSession(async_engine) as session:
+        count = await rebuild_team_question_state(session)
+        await session.commit()
+    await async_engine.dispose()
+    print(f"Rebuilt {count} team question state(s)")
+
+
+async def regrade(number: int, dry_run: bool):
+    """Regrade all submissions of a question and show which teams change."""
+    async with AsyncSession(async_engine) as session:
+        question = (
+            await session.exec(select(Question).where(Question.number == number))
+        ).first()
+        if question is None:
+            print(f"Question {number} does not exist")
+        else:
+            report = await regrade_question(session, question, dry_run=dry_run)
+            await session.commit()
+            print(
+                f"{report.submissions} submission(s) "
+                + ("would change" if dry_run else "changed")
+                + " correctness"
+            )
+            for team in report.teams:
+                print(
+                    f"  {team.team_name}: solved {team.solved_before} -> "
+                    f"{team.solved_after}, score {team.score_before:.2f} -> "
+                    f"{team.score_after:.2f}"
+                )
+    await async_engine.dispose()
+
+
+def main():
+    parser = argparse.ArgumentParser(prog="python -m app.commands")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    backfill = commands.add_parser(
+        "backfill-question-html", help=backfill_question_html.__doc__
+    )
+    backfill.add_argument(
+        "--all",
+        action="store_true",
+        help="also re-render questions that already have html, "
+        "for example after changing the math2svg filter",
+    )
+
+    commands.add_parser("rebuild-scores", help=rebuild_scores.__doc__)
+
+    regrade_parser = commands.add_parser("regrade", help=regrade.__doc__)
+    regrade_parser.add_argument("number", type=int, help="number of the question")
+    regrade_parser.add_argument(
+        "--dry-run",
+        action="store_true",
+        help="only show what would change, without saving it",
+    )
+
+    args = parser.parse_args()
+    if args.command == "backfill-question-html":
+        backfill_question_html(args.all)
+    elif args.command == "rebuild-scores":
+        asyncio.run(rebuild_scores())
+    elif args.command == "regrade":
+        asyncio.run(regrade(args.number, args.dry_run))
+
+
+if __name__ == "__main__":
+    main()
@@ -35,12 +35,55 @@ class Settings(BaseSettings):
     JWT_ALGORITHM: str = "HS256"
     JWT_SECRET_KEY: str
 
+    # How long each worker trusts a team it loaded, 0 to load it on every request
+    AUTH_CACHE_SECONDS: float = 5.0
+
+    # Rendered markdown, shared by all workers
+    RENDER_CACHE_DIR: str = ".cache/render"
+    RENDER_CACHE_MAX_BYTES: int = 256 * 1024 * 1024
+
+    # Prebuilt question pdf's, rendered by a pool of worker processes
+    PDF_CACHE_DIR: str = ".cache/pdf"
+    PDF_WORKERS: int = 1
+    # Also build the questions pdf while warming up a worker, see app/api/warmup.py
+    WARMUP_QUESTIONS_PDF: bool = False
+
+    # Socket of pandoc-filters/mathjax-daemon.js, leave empty to always use tex2svg
+    MATHJAX_SOCKET: str = "/tmp/coma-mathjax.sock"
+    MATHJAX_TIMEOUT_SECONDS: float = 10.0
+
+    # Logos are served per quality bucket, this is the number of buckets
+    LOGO_QUALITY_STEPS: int = 100
+
+    # How often each worker checks for leaderboard changes to push
+    LEADERBOARD_POLL_SECONDS: float = 1.0
+    LEADERBOARD_KEEPALIVE_SECONDS: float = 15.0
+
+    # Commit the submissions of concurrent requests together instead of in a
+    # transaction each, collecting them for up to SUBMISSION_BATCH_MILLISECONDS
+    SUBMISSION_BATCHING: bool = False
+    SUBMISSION_BATCH_MILLISECONDS: float = 5.0
+    SUBMISSION_BATCH_SIZE: int = 500
+
     POSTGRES_SERVER: str
     POSTGRES_PORT: int = 5432
     POSTGRES_USER: str
     POSTGRES_DB: str
     POSTGRES_PASSWORD: str = ""
 
+    # Connection pool of each worker, so a deployment opens up to
+    # workers * (DATABASE_POOL_SIZE + DATABASE_MAX_OVERFLOW) connections
+    DATABASE_POOL_SIZE: int = 5
+    DATABASE_MAX_OVERFLOW: int = 10
+    DATABASE_POOL_TIMEOUT_SECONDS: float = 30.0
+    # Reconnect connections older than this, -1 to keep them
+    DATABASE_POOL_RECYCLE_SECONDS: int = -1
+    # Test connections before using them, to survive database restarts
+    DATABASE_POOL_PRE_PING: bool = False
+    # Behind PgBouncer in transaction mode: don't pool connections in the
+    # workers and don't reuse prepared statements across transactions
+    DATABASE_PGBOUNCER: bool = False
+
     @computed_field
     @property
     def SQLALCHEMY_DATABASE_URI(self) -> MultiHostUrl:
@@ -53,5 +96,17 @@ class Settings(BaseSettings):
             path=self.POSTGRES_DB,
         )
 
+    @computed_field
+    @property
+    def SQLALCHEMY_ASYNC_DATABASE_URI(self) -> MultiHostUrl:
+        return MultiHostUrl.build(
+            scheme="postgresql+asyncpg",
+            username=self.POSTGRES_USER,
+            password=self.POSTGRES_PASSWORD,
+            host=self.POSTGRES_SERVER,
+            port=self.POSTGRES_PORT,
+            path=self.POSTGRES_DB,
+        )
+
 
 settings = Settings()  # type: ignore
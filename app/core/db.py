@@ -1,9 +1,178 @@
+import time
+from collections.abc import Iterator
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass
+from uuid import uuid4
+
+from sqlalchemy import event, text
+from sqlalchemy.exc import TimeoutError
+from sqlalchemy.ext.asyncio import create_async_engine
+from sqlalchemy.pool import AsyncAdaptedQueuePool, NullPool, Pool, QueuePool
 from sqlmodel import Session, SQLModel, create_engine
+from sqlmodel.ext.asyncio.session import AsyncSession
 
 from app.core.config import settings
+from app.core.metrics import record
+
+
+class PoolStats:
+    """Connections handed out by the pool of this worker, and their wait."""
+
+    def __init__(self):
+        self.checked_out = 0
+        self.checkouts = 0
+        self.timeouts = 0
+        self.wait_seconds_total = 0.0
+        self.wait_seconds_max = 0.0
+
+    def record_wait(self, seconds: float):
+        self.checkouts += 1
+        self.wait_seconds_total += seconds
+        self.wait_seconds_max = max(self.wait_seconds_max, seconds)
+
+
+pool_stats = PoolStats()
+
+
+def timed_pool(pool_class: type[Pool]) -> type[Pool]:
+    """Return a subclass of `pool_class` that records in `pool_stats`."""
+
+    class TimedPool(pool_class):
+        # `_do_get` waits for a free connection, or opens a new one
+        def _do_get(self):
+            start = time.perf_counter()
+            try:
+                return super()._do_get()
+            except TimeoutError:
+                pool_stats.timeouts += 1
+                raise
+            finally:
+                pool_stats.record_wait(time.perf_counter() - start)
+
+    TimedPool.__name__ = pool_class.__name__
+    return TimedPool
+
+
+def async_engine_options() -> dict:
+    if settings.DATABASE_PGBOUNCER:
+        return {
+            "poolclass": timed_pool(NullPool),
+            "pool_pre_ping": settings.DATABASE_POOL_PRE_PING,
+            # A transaction may run on another server connection than the
+            # previous one, so statements can't stay prepared between them
+            "connect_args": {
+                "statement_cache_size": 0,
+                "prepared_statement_cache_size": 0,
+                "prepared_statement_name_func": lambda: f"__asyncpg_{uuid4()}__",
+            },
+        }
+    return {
+        "poolclass": timed_pool(AsyncAdaptedQueuePool),
+        "pool_size": settings.DATABASE_POOL_SIZE,
+        "max_overflow": settings.DATABASE_MAX_OVERFLOW,
+        "pool_timeout": settings.DATABASE_POOL_TIMEOUT_SECONDS,
+        "pool_recycle": settings.DATABASE_POOL_RECYCLE_SECONDS,
+        "pool_pre_ping": settings.DATABASE_POOL_PRE_PING,
+    }
+
 
 engine = create_engine(str(settings.SQLALCHEMY_DATABASE_URI))
 
+# Used by the request handlers, so queries don't block the event loop
+async_engine = create_async_engine(
+    str(settings.SQLALCHEMY_ASYNC_DATABASE_URI), **async_engine_options()
+)
+
+
+@event.listens_for(async_engine.sync_engine, "checkout")
+def count_checkout(dbapi_connection, connection_record, connection_proxy):
+    pool_stats.checked_out += 1
+
+
+@event.listens_for(async_engine.sync_engine, "checkin")
+def count_checkin(dbapi_connection, connection_record):
+    pool_stats.checked_out -= 1
+
+
+@dataclass
+class QueryCount:
+    """Statements executed in a block and the time they took."""
+
+    statements: int = 0
+    seconds: float = 0.0
+
+
+current_query_count: ContextVar[QueryCount | None] = ContextVar(
+    "current_query_count", default=None
+)
+
+
+@contextmanager
+def count_queries() -> Iterator[QueryCount]:
+    """
+    Count the statements of `async_engine` executed within the block.
+
+    Tasks started in the block, like the body of a streamed response, are
+    counted as well.
+    """
+    count = QueryCount()
+    token = current_query_count.set(count)
+    try:
+        yield count
+    finally:
+        current_query_count.reset(token)
+
+
+@event.listens_for(async_engine.sync_engine, "before_cursor_execute")
+def start_query_timer(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("query_start", []).append(time.perf_counter())
+
+
+@event.listens_for(async_engine.sync_engine, "after_cursor_execute")
+def record_query_time(conn, cursor, statement, parameters, context, executemany):
+    seconds = time.perf_counter() - conn.info["query_start"].pop()
+    record("db", seconds)
+    count = current_query_count.get()
+    if count is not None:
+        count.statements += 1
+        count.seconds += seconds
+
+
+async def pool_status(session: AsyncSession) -> dict:
+    """
+    Return the state of the connection pool of this worker.
+
+    Every worker has its own pool, so this also returns the number of
+    connections to the database of all workers together.
+    """
+    connections, max_connections = (
+        await session.exec(
+            text(
+                "SELECT count(*), current_setting('max_connections')::int"
+                " FROM pg_stat_activity WHERE datname = current_database()"
+            )
+        )
+    ).one()
+    pool = async_engine.pool
+    status = {
+        "pool": type(pool).__name__,
+        "checked_out": pool_stats.checked_out,
+        "checkouts": pool_stats.checkouts,
+        "timeouts": pool_stats.timeouts,
+        "wait_seconds_total": pool_stats.wait_seconds_total,
+        "wait_seconds_max": pool_stats.wait_seconds_max,
+    }
+    if isinstance(pool, QueuePool):
+        status["size"] = pool.size()
+        status["max_overflow"] = settings.DATABASE_MAX_OVERFLOW
+        # Negative while the pool has not opened `size` connections yet
+        status["overflow"] = max(pool.overflow(), 0)
+        status["checked_in"] = pool.checkedin()
+    status["database_connections"] = connections
+    status["database_max_connections"] = max_connections
+    return status
+
 
 def init_db() -> None:
     SQLModel.metadata.create_all(engine)
@@ -12,3 +181,9 @@ def init_db() -> None:
 def get_session():
     with Session(engine) as session:
         yield session
+
+
+async def get_async_session():
+    # Objects stay loaded after a commit, there is no lazy loading in async code
+    async with AsyncSession(async_engine, expire_on_commit=False) as session:
+        yield session
@@ -0,0 +1,43 @@
+"""Client for the MathJax daemon in `pandoc-filters/mathjax-daemon.js`."""
+
+import json
+import logging
+import socket
+from typing import List, Tuple
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+
+def render_math_to_svg(formulas: List[Tuple[str, bool]]) -> List[str | None] | None:
+    """
+    Render a batch of `(tex, inline)` formulas to svg with the MathJax daemon.
+
+    Formulas that failed to render are `None`.
+    Returns `None` when the daemon is not configured or not reachable,
+    callers should then fall back to rendering the formulas themselves.
+    """
+    if not settings.MATHJAX_SOCKET or not formulas:
+        return None
+
+    request = {"formulas": [{"tex": tex, "inline": inline} for tex, inline in formulas]}
+    try:
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+            sock.settimeout(settings.MATHJAX_TIMEOUT_SECONDS)
+            sock.connect(settings.MATHJAX_SOCKET)
+            sock.sendall(json.dumps(request).encode() + b"\n")
+            response = b""
+            while not response.endswith(b"\n"):
+                chunk = sock.recv(65536)
+                if not chunk:
+                    break
+                response += chunk
+        svgs = json.loads(response)["svgs"]
+    except (OSError, ValueError, KeyError) as e:
+        logger.debug(f"MathJax daemon unavailable, falling back to tex2svg: {e}")
+        return None
+
+    if len(svgs) != len(formulas):
+        return None
+    return svgs
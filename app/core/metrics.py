@@ -0,0 +1,216 @@
+"""
+Timing of requests and of the phases they spend their time in.
+
+`timed(phase)` adds the duration of a block to the request being handled,
+`TimingMiddleware` reports those phases in a `Server-Timing` header and
+feeds the per-route histograms, which `render_metrics` writes in the
+Prometheus text format. Everything is kept per worker.
+"""
+
+import time
+from collections import defaultdict
+from collections.abc import Iterator
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+# Upper bounds, in seconds, of the latency histogram buckets
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+class RequestTiming:
+    """Total duration and count of every phase of one request."""
+
+    def __init__(self):
+        self.phases: dict[str, list[float]] = defaultdict(lambda: [0.0, 0])
+
+    def add(self, phase: str, seconds: float):
+        totals = self.phases[phase]
+        totals[0] += seconds
+        totals[1] += 1
+
+    def header(self, total: float) -> str:
+        """Return the value of the `Server-Timing` header."""
+        metrics = [
+            f'{phase};desc="{count}x";dur={seconds * 1000:.1f}'
+            for phase, (seconds, count) in self.phases.items()
+        ]
+        metrics.append(f"total;dur={total * 1000:.1f}")
+        return ", ".join(metrics)
+
+
+current_timing: ContextVar[RequestTiming | None] = ContextVar(
+    "current_timing", default=None
+)
+
+
+def record(phase: str, seconds: float):
+    """Add `seconds` spent in `phase` to the request being handled, if any."""
+    timing = current_timing.get()
+    if timing is not None:
+        timing.add(phase, seconds)
+
+
+@contextmanager
+def timed(phase: str) -> Iterator[None]:
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        record(phase, time.perf_counter() - start)
+
+
+class Histogram:
+    """A Prometheus histogram, with a series per combination of label values."""
+
+    def __init__(self, name: str, help: str, labels: tuple[str, ...]):
+        self.name = name
+        self.help = help
+        self.labels = labels
+        # Per series the count of every bucket, then the sum
+        self.series: dict[tuple[str, ...], tuple[list[int], list[float]]] = {}
+
+    def observe(self, labels: tuple[str, ...], value: float):
+        if labels not in self.series:
+            self.series[labels] = ([0] * (len(BUCKETS) + 1), [0.0])
+        counts, total = self.series[labels]
+        for i, bound in enumerate(BUCKETS):
+            if value <= bound:
+                counts[i] += 1
+                break
+        else:
+            counts[-1] += 1
+        total[0] += value
+
+    def render(self) -> Iterator[str]:
+        yield f"# HELP {self.name} {self.help}"
+        yield f"# TYPE {self.name} histogram"
+        for labels, (counts, total) in sorted(self.series.items()):
+            base = format_labels(zip(self.labels, labels))
+            cumulative = 0
+            for bound, count in zip([*map(str, BUCKETS), "+Inf"], counts):
+                cumulative += count
+                le = format_labels([*zip(self.labels, labels), ("le", bound)])
+                yield f"{self.name}_bucket{le} {cumulative}"
+            yield f"{self.name}_sum{base} {total[0]}"
+            yield f"{self.name}_count{base} {cumulative}"
+
+
+class Counter:
+    """A Prometheus counter, with a series per combination of label values."""
+
+    def __init__(self, name: str, help: str, labels: tuple[str, ...]):
+        self.name = name
+        self.help = help
+        self.labels = labels
+        self.values: dict[tuple[str, ...], float] = defaultdict(float)
+
+    def inc(self, labels: tuple[str, ...], value: float = 1.0):
+        self.values[labels] += value
+
+    def render(self) -> Iterator[str]:
+        yield f"# HELP {self.name} {self.help}"
+        yield f"# TYPE {self.name} counter"
+        for labels, value in sorted(self.values.items()):
+            yield f"{self.name}{format_labels(zip(self.labels, labels))} {value}"
+
+
+def format_labels(labels) -> str:
+    pairs = [f'{name}="{escape_label(value)}"' for name, value in labels]
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def escape_label(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def sample(name: str, help: str, type: str, value: float) -> list[str]:
+    """Return the lines of a metric without labels."""
+    return [f"# HELP {name} {help}", f"# TYPE {name} {type}", f"{name} {value}"]
+
+
+request_duration = Histogram(
+    "coma_request_duration_seconds",
+    "Time to handle a request, until its response starts.",
+    ("method", "route", "status"),
+)
+phase_duration = Counter(
+    "coma_request_phase_seconds_total",
+    "Time requests spent in a phase, like db or template.",
+    ("route", "phase"),
+)
+phase_calls = Counter(
+    "coma_request_phase_calls_total",
+    "Number of times requests entered a phase.",
+    ("route", "phase"),
+)
+
+
+def route_path(scope) -> str:
+    """Return the path template of the route that handled `scope`."""
+    endpoint = scope.get("endpoint")
+    if endpoint is not None:
+        for route in scope["app"].routes:
+            if getattr(route, "endpoint", getattr(route, "app", None)) is endpoint:
+                return route.path
+    return "unmatched"
+
+
+class TimingMiddleware:
+    """
+    Time every http request and the phases recorded with `timed` during it.
+
+    The phases are sent in a `Server-Timing` header and, like the duration
+    of the request, added to the metrics of its route. The response of a
+    streamed body starts before the body is generated, so its time is not
+    included.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        timing = RequestTiming()
+        token = current_timing.set(timing)
+        start = time.perf_counter()
+        started = False
+
+        def observe(status: int) -> float:
+            total = time.perf_counter() - start
+            route = route_path(scope)
+            request_duration.observe((scope["method"], route, str(status)), total)
+            for phase, (seconds, count) in timing.phases.items():
+                phase_duration.inc((route, phase), seconds)
+                phase_calls.inc((route, phase), count)
+            return total
+
+        async def send_with_timing(message):
+            nonlocal started
+            if message["type"] == "http.response.start":
+                started = True
+                total = observe(message["status"])
+                header = timing.header(total).encode()
+                message["headers"] = [*message["headers"], (b"server-timing", header)]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            # The error response of an exception is sent outside this middleware
+            if not started:
+                observe(500)
+            current_timing.reset(token)
+
+
+def render_metrics(extra: list[str] | None = None) -> str:
+    """Return every metric in the Prometheus text format."""
+    lines = [
+        *request_duration.render(),
+        *phase_duration.render(),
+        *phase_calls.render(),
+        *(extra or []),
+    ]
+    return "\n".join(lines) + "\n"
@@ -0,0 +1,128 @@
+"""Content-addressed on-disk cache for rendered documents."""
+
+import hashlib
+import os
+import tempfile
+import threading
+from pathlib import Path
+
+# Fraction of the budget a worker writes before it measures the directory
+# again, to see what the other workers wrote
+RESCAN_FRACTION = 0.1
+
+
+class RenderCache:
+    """
+    Store rendered documents as files named after the hash of their inputs.
+
+    The cache directory can be shared by all workers and survives restarts.
+    Entries are written atomically, and when the cache grows beyond
+    `max_bytes` the least recently used entries are removed.
+    Hits refresh the modification time of an entry, which is used as its
+    last use.
+
+    The limit is approximate: every worker only measures the directory
+    after writing `RESCAN_FRACTION` of the budget itself, so with N workers
+    it can exceed `max_bytes` by up to N times that fraction.
+    """
+
+    def __init__(self, directory: str | Path, max_bytes: int):
+        self.directory = Path(directory)
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+        # Size of the directory when it was last measured, and the bytes
+        # this worker added since
+        self._size: int | None = None
+        self._written = 0
+
+    @staticmethod
+    def key(*parts: str | bytes) -> str:
+        """Hash `parts` into a cache key."""
+        digest = hashlib.sha256()
+        for part in parts:
+            if isinstance(part, str):
+                part = part.encode()
+            digest.update(len(part).to_bytes(8, "little"))
+            digest.update(part)
+        return digest.hexdigest()
+
+    def _path(self, key: str) -> Path:
+        return self.directory / key[:2] / key
+
+    def get(self, key: str) -> str | None:
+        path = self._path(key)
+        try:
+            value = path.read_text()
+            os.utime(path)
+        except FileNotFoundError:
+            with self._lock:
+                self.misses += 1
+            return None
+        with self._lock:
+            self.hits += 1
+        return value
+
+    def set(self, key: str, value: str):
+        path = self._path(key)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        try:
+            old_size = path.stat().st_size
+        except FileNotFoundError:
+            old_size = 0
+        fd, tmp = tempfile.mkstemp(dir=path.parent, suffix=".tmp")
+        with os.fdopen(fd, "w") as f:
+            f.write(value)
+        os.replace(tmp, path)
+
+        with self._lock:
+            self._written += len(value.encode()) - old_size
+            if self._size is None or self._written > self.max_bytes * RESCAN_FRACTION:
+                self._size = self._disk_usage()
+                self._written = 0
+            if self._size + self._written > self.max_bytes:
+                self._evict()
+
+    def _entries(self) -> list[Path]:
+        return [p for p in self.directory.glob("*/*") if p.suffix != ".tmp"]
+
+    def _disk_usage(self) -> int:
+        size = 0
+        for path in self._entries():
+            try:
+                size += path.stat().st_size
+            except FileNotFoundError:
+                pass  # Evicted by another worker
+        return size
+
+    def _evict(self):
+        """Remove the least recently used entries until 90% of the budget is left."""
+        entries = []
+        for path in self._entries():
+            try:
+                stat = path.stat()
+            except FileNotFoundError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, path))
+        entries.sort()
+
+        size = sum(entry[1] for entry in entries)
+        target = self.max_bytes * 0.9
+        for _, entry_size, path in entries:
+            if size <= target:
+                break
+            path.unlink(missing_ok=True)
+            size -= entry_size
+            self.evictions += 1
+        self._size = size
+        self._written = 0
+
+    def stats(self) -> dict[str, int]:
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+            }
@@ -1,12 +1,32 @@
 """Render document types to other document types."""
 
+import hashlib
 import logging
+import os
+import tempfile
 from functools import lru_cache
+from pathlib import Path
 from typing import List, Tuple
 
 import pandoc
 import weasyprint
-from pandoc.types import Meta, Pandoc, Plain
+from pandoc.types import (
+    Block,
+    Div,
+    Format,
+    InlineMath,
+    Math,
+    Meta,
+    Pandoc,
+    Plain,
+    RawBlock,
+    RawInline,
+)
+
+from app.core.config import settings
+from app.core.mathjax import render_math_to_svg
+from app.core.metrics import timed
+from app.core.render_cache import RenderCache
 
 
 def plumbum_call_with_log(self, args):
@@ -19,6 +39,32 @@ def plumbum_call_with_log(self, args):
 pandoc.plumbum.machines.LocalCommand.__call__ = plumbum_call_with_log
 
 
+MATH2SVG_FILTER = "pandoc-filters/math2svg.lua"
+READ_FRAGMENTS_FILTER = "pandoc-filters/read-fragments.lua"
+WRITE_FRAGMENTS_FILTER = "pandoc-filters/write-fragments.lua"
+MATHJAX_DAEMON = "pandoc-filters/mathjax-daemon.js"
+
+# Rendered html depends on the filters and on the MathJax options of the
+# daemon, so they are part of every cache key
+FILTERS_HASH = hashlib.sha256(
+    b"".join(
+        Path(f).read_bytes()
+        for f in [
+            MATH2SVG_FILTER,
+            READ_FRAGMENTS_FILTER,
+            WRITE_FRAGMENTS_FILTER,
+            MATHJAX_DAEMON,
+        ]
+    )
+).hexdigest()
+# Also part of every cache key, bump it to drop html rendered by older code
+RENDER_VERSION = "3"
+
+render_cache = RenderCache(
+    settings.RENDER_CACHE_DIR, max_bytes=settings.RENDER_CACHE_MAX_BYTES
+)
+
+
 @lru_cache(maxsize=256)
 def render_md_to_html(md: str, inline: bool = False) -> str:
     """
@@ -31,22 +77,119 @@ def render_md_to_html(md: str, inline: bool = False) -> str:
     element.
 
     Math expressions `$expr$` and `$$expr$$` are rendered as svg's.
+
+    Results are also kept in the on-disk `render_cache`, which is shared by
+    all workers and survives restarts.
+    """
+    return render_md_to_html_batch([(md, inline)])[0]
+
+
+def render_md_to_html_batch(fragments: List[Tuple[str, bool]]) -> List[str]:
+    """
+    Render a list of `(md, inline)` markdown fragments to html.
+
+    This returns the same html as `render_md_to_html(md, inline)` for every
+    fragment, but all fragments that are not cached yet are read and written
+    by a single pandoc process each, and their math is rendered with a single
+    request to the MathJax daemon.
     """
-    doc: Tuple(Meta, List[Pandoc]) = pandoc.read(
-        source=md,
-        format="markdown",
+    keys = [
+        RenderCache.key(md, str(inline), FILTERS_HASH, RENDER_VERSION)
+        for md, inline in fragments
+    ]
+    cached = [render_cache.get(key) for key in keys]
+
+    missing = list({fragments[i]: i for i, html in enumerate(cached) if html is None})
+    rendered = {}
+    if missing:
+        with timed("pandoc"):
+            rendered = dict(zip(missing, _render_md_to_html_batch(missing)))
+        for key, fragment, html in zip(keys, fragments, cached):
+            if html is None:
+                render_cache.set(key, rendered[fragment])
+
+    return [
+        html if html is not None else rendered[fragment]
+        for fragment, html in zip(fragments, cached)
+    ]
+
+
+def _math_to_svg(docs):
+    """
+    Replace all math in `docs` by svg's rendered with the MathJax daemon.
+
+    This produces the same html as the math2svg filter, which still renders
+    any math that is left when the daemon is unavailable. The formulas of
+    all documents are sent to the daemon together.
+    """
+    maths = [
+        (elt, path[-1])
+        for doc in docs
+        for elt, path in pandoc.iter(doc, path=True)
+        if isinstance(elt, Math)
+    ]
+    svgs = render_math_to_svg(
+        [(elt[1], isinstance(elt[0], InlineMath)) for elt, _ in maths]
     )
-    if inline:
-        doc[1][0] = Plain(*doc[1][0])
-    html = pandoc.write(
-        doc=doc,
-        format="html",
-        options=[
-            "--lua-filter=pandoc-filters/math2svg.lua",
-            "--mathml",  # Fallback
-        ],
+    if svgs is None:
+        return
+
+    for (elt, (holder, index)), svg in zip(maths, svgs):
+        if svg is not None:
+            kind = "inline" if isinstance(elt[0], InlineMath) else "display"
+            holder[index] = RawInline(
+                Format("html"), f'<span class="math {kind}">{svg}</span>'
+            )
+
+
+def _run_lua_filter(blocks: List[Block], lua_filter: str) -> List[Block]:
+    """Pass a document of `blocks` through `lua_filter` in one pandoc process."""
+    # Importing pandoc.types configured the pandoc program
+    config = pandoc.configure(read=True)
+    assert config is not None
+    command = pandoc.plumbum.machines.LocalCommand(config["path"])
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        input_path = os.path.join(tmp_dir, "input.json")
+        output_path = os.path.join(tmp_dir, "output.json")
+        pandoc.write(Pandoc(Meta({}), blocks), file=input_path, format="json")
+        command(
+            [
+                "--from=json",
+                "--to=json",
+                f"--lua-filter={lua_filter}",
+                f"--output={output_path}",
+                input_path,
+            ]
+        )
+        doc: Pandoc = pandoc.read(file=output_path, format="json")
+    return doc[1]
+
+
+def _render_md_to_html_batch(fragments: List[Tuple[str, bool]]) -> List[str]:
+    """
+    Render every fragment as its own document, with one pandoc process to
+    read them all, one MathJax round trip and one pandoc process to write
+    them all.
+
+    The filters read and write every fragment separately, so footnotes,
+    header ids and reference links stay within their fragment.
+    """
+    divs = _run_lua_filter(
+        [RawBlock(Format("markdown"), md) for md, _ in fragments],
+        READ_FRAGMENTS_FILTER,
     )
-    return html
+    docs = []
+    for (_, inline), div in zip(fragments, divs):
+        blocks = div[1]
+        if inline:
+            blocks[0] = Plain(*blocks[0])
+        docs.append(Pandoc(Meta({}), blocks))
+    _math_to_svg(docs)
+
+    htmls = _run_lua_filter(
+        [Div(("", [], []), doc[1]) for doc in docs], WRITE_FRAGMENTS_FILTER
+    )
+    return [html[1] for html in htmls]
 
 
 logging.getLogger("weasyprint").addHandler(logging._StderrHandler())
@@ -56,6 +199,16 @@ logging.getLogger("weasyprint").setLevel(logging.INFO)
 @lru_cache(maxsize=8)
 def render_html_to_pdf(html: str) -> bytes:
     """Render the html string `html` to an in-memory pdf file."""
-    html_doc = weasyprint.HTML(string=html)
-    pdf_doc: weasyprint.Document = html_doc.render()
-    return pdf_doc.write_pdf()
+    with timed("weasyprint"):
+        html_doc = weasyprint.HTML(string=html)
+        pdf_doc: weasyprint.Document = html_doc.render()
+        return pdf_doc.write_pdf()
+
+
+def write_html_to_pdf(html: str, path: str):
+    """Render the html string `html` to a pdf file at `path`, atomically."""
+    pdf = render_html_to_pdf(html)
+    fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+    with os.fdopen(fd, "wb") as f:
+        f.write(pdf)
+    os.replace(tmp, path)
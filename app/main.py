@@ -1,22 +1,42 @@
+from contextlib import asynccontextmanager
+
 from fastapi import FastAPI, Request
 from fastapi.responses import RedirectResponse
 from fastapi.routing import APIRoute
 from fastapi.staticfiles import StaticFiles
 
 from app.api.exception import RequiresLoginException
+from app.api.ingest import submission_batcher
+from app.api.pdf import shutdown_pdf_pool
 from app.api.routes import router
+from app.api.warmup import warmup
 from app.core.config import settings
+from app.core.db import async_engine
+from app.core.metrics import TimingMiddleware
 
 
 def custom_generate_unique_id(route: APIRoute) -> str:
     return f"{route.tags[0]}-{route.name}"
 
 
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    warmup.start()
+    yield
+    await warmup.stop()
+    await submission_batcher.stop()
+    shutdown_pdf_pool()
+    await async_engine.dispose()
+
+
 app = FastAPI(
     title=settings.PROJECT_NAME,
     generate_unique_id_function=custom_generate_unique_id,
+    lifespan=lifespan,
 )
 
+app.add_middleware(TimingMiddleware)
+
 app.mount("/static", StaticFiles(directory="app/static"), name="static")
 
 
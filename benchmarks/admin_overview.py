@@ -0,0 +1,127 @@
+"""
+Compare the admin team/question matrix and scoreboard with the original scan.
+
+The original `admin_page` loaded every submission and scanned all of them for
+every team and question, and queried the submissions of every team again for
+the scoreboard. Now both come from aggregate queries on `team_question_state`.
+
+The original is too slow to run on the full contest, so it only builds the
+rows of `--reference-teams` teams and its time is extrapolated to all teams.
+
+Run with:
+
+    python -m benchmarks.admin_overview [--teams 200] [--questions 50]
+        [--submissions 100000]
+"""
+
+import argparse
+import asyncio
+import time
+
+from sqlmodel import select
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from app.api.models import Question, Submission, Team
+from app.api.scores import get_team_question_cells, get_team_scores
+from app.api.utils import get_question_score, is_answer_correct
+from benchmarks.seed import create_schema, drop_schema, schema_engine, seed_contest
+
+
+async def overview_scan(session: AsyncSession, reference_teams: int):
+    """The original matrix and scoreboard, for the first `reference_teams` teams."""
+    questions = (await session.exec(select(Question).order_by(Question.number))).all()
+    submissions = (await session.exec(select(Submission))).all()
+    teams = (await session.exec(select(Team).order_by(Team.name))).all()
+    teams = teams[:reference_teams]
+
+    matrix = []
+    for team in teams:
+        row = []
+        for question in questions:
+            question_submissions = [
+                s
+                for s in submissions
+                if s.team_id == team.id and s.question_id == question.id
+            ]
+            correct = any(
+                is_answer_correct(s.answer, question.solution, question.accuracy)
+                for s in question_submissions
+            )
+            row.append((len(question_submissions), correct))
+        matrix.append(row)
+
+    scores = []
+    for team in teams:
+        team_submissions = (
+            await session.exec(select(Submission).where(Submission.team_id == team.id))
+        ).all()
+        score = 0
+        for question in questions:
+            question_submissions = [
+                s for s in team_submissions if s.question_id == question.id
+            ]
+            score += get_question_score(team, question, question_submissions)
+        scores.append(score)
+
+    return matrix, scores
+
+
+async def overview_aggregate(session: AsyncSession):
+    """The matrix and scoreboard as built by `admin_page`."""
+    questions = (await session.exec(select(Question).order_by(Question.number))).all()
+    team_scores = await get_team_scores(session)
+    cells = await get_team_question_cells(session)
+
+    matrix = [
+        [cells.get((team.id, question.id), (0, None)) for question in questions]
+        for team, _ in team_scores
+    ]
+    scores = sorted((score for _, score in team_scores), reverse=True)
+    return matrix, scores
+
+
+async def main(teams: int, questions: int, submissions: int, reference_teams: int):
+    engine = schema_engine()
+    try:
+        print(
+            f"Seeding {teams} teams, {questions} questions"
+            f" and {submissions} submissions"
+        )
+        await create_schema(engine)
+        await seed_contest(engine, teams, questions, submissions)
+
+        async with AsyncSession(engine) as session:
+            start = time.perf_counter()
+            scan_matrix, _ = await overview_scan(session, reference_teams)
+            scan = (time.perf_counter() - start) * teams / reference_teams
+
+        async with AsyncSession(engine) as session:
+            number = 10
+            start = time.perf_counter()
+            for _ in range(number):
+                aggregate_matrix, _ = await overview_aggregate(session)
+            aggregate = (time.perf_counter() - start) / number
+
+        for scan_row, aggregate_row in zip(scan_matrix, aggregate_matrix):
+            for scan_cell, (attempts, solved) in zip(scan_row, aggregate_row):
+                assert scan_cell == (attempts, bool(solved))
+
+        print(f"{'scan (ms, estimated)':>22} {'aggregate (ms)':>15} {'speedup':>8}")
+        print(
+            f"{scan * 1000:>22.0f} {aggregate * 1000:>15.1f} {scan / aggregate:>7.0f}x"
+        )
+    finally:
+        await drop_schema(engine)
+        await engine.dispose()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(prog="python -m benchmarks.admin_overview")
+    parser.add_argument("--teams", type=int, default=200)
+    parser.add_argument("--questions", type=int, default=50)
+    parser.add_argument("--submissions", type=int, default=100_000)
+    parser.add_argument("--reference-teams", type=int, default=5)
+    args = parser.parse_args()
+    asyncio.run(
+        main(args.teams, args.questions, args.submissions, args.reference_teams)
+    )
@@ -0,0 +1,122 @@
+"""
+Check that no route runs more queries than its budget.
+
+Seeds a synthetic contest in the `benchmark` schema, requests every route
+through the app while counting its statements with `count_queries`, and
+compares them with `BUDGETS`. The contest has more teams and questions
+than any budget, so a query per team or per question (like scoring every
+team in a loop) fails the check. Exits with status 1 if a route goes over
+its budget.
+
+The cache of authenticated teams is disabled, so the budgets include
+loading the team of the request.
+
+Run with:
+
+    python -m benchmarks.check_query_budgets [--teams 50] [--questions 30]
+        [--submissions 5000]
+"""
+
+import argparse
+import asyncio
+import sys
+
+import httpx
+
+from app.api.team_cache import team_cache
+from app.core.db import async_engine, count_queries
+from app.main import app
+from benchmarks.seed import (
+    BENCHMARK_SCHEMA,
+    create_schema,
+    drop_schema,
+    seed_contest,
+    use_schema,
+)
+
+REGRADE_FORM = {
+    "title": "Question 1",
+    "body": "What is the answer to question 1?",
+    "number": 1,
+    "max_score": 1,
+    "max_score_display": "1",
+    "solution": "1.5",
+    "accuracy": 2,
+    "visible": True,
+}
+
+# Name, method, path, whether an admin requests it, form data and the
+# maximum number of statements
+BUDGETS: list[tuple[str, str, str, bool, dict | None, int]] = [
+    ("login", "POST", "/login", False, {"name": "team2", "password": "team2"}, 1),
+    ("home", "GET", "/", False, None, 3),
+    ("question", "GET", "/question/1", False, None, 3),
+    ("submit", "POST", "/question/1/submission", False, {"answer": "1.5"}, 4),
+    ("leaderboard", "GET", "/leaderboard", False, None, 5),
+    ("questions pdf", "GET", "/questions-pdf?html", False, None, 2),
+    ("admin", "GET", "/admin", True, None, 5),
+    ("feed", "GET", "/admin/submissions", True, None, 4),
+    ("feed by team", "GET", "/admin/submissions?team=2", True, None, 4),
+    ("teams.csv", "GET", "/admin/teams.csv", True, None, 3),
+    ("answers.csv", "GET", "/admin/answers.csv", True, None, 2),
+    (
+        "preview regrade",
+        "POST",
+        "/admin/question/1?dry_run=true",
+        True,
+        REGRADE_FORM,
+        10,
+    ),
+    ("reset question", "POST", "/admin/question/2/reset", True, None, 5),
+    ("delete team", "POST", "/admin/team/3/delete", True, None, 3),
+]
+
+
+async def login(client: httpx.AsyncClient, name: str) -> str:
+    response = await client.post("/login", data={"name": name, "password": name})
+    return response.cookies["auth_jwt"]
+
+
+async def main(teams: int, questions: int, submissions: int) -> bool:
+    use_schema(async_engine, BENCHMARK_SCHEMA)
+    print(f"Seeding {teams} teams, {questions} questions and {submissions} submissions")
+    await create_schema(async_engine)
+    await seed_contest(async_engine, teams, questions, submissions)
+    team_cache.ttl = 0
+
+    ok = True
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+        # team1 is the admin, see seed_contest
+        admin_token = await login(client, "team1")
+        team_token = await login(client, "team2")
+
+        print(f"{'route':<20} {'queries':>7} {'budget':>6} {'db ms':>8}")
+        for name, method, path, admin, data, budget in BUDGETS:
+            client.cookies.set("auth_jwt", admin_token if admin else team_token)
+            with count_queries() as count:
+                response = await client.request(method, path, data=data)
+            if response.status_code >= 400:
+                raise RuntimeError(f"{name}: {response.status_code}")
+            status = "ok"
+            if count.statements > budget:
+                ok = False
+                status = "FAIL"
+            print(
+                f"{name:<20} {count.statements:>7} {budget:>6}"
+                f" {count.seconds * 1000:>8.1f} {status}"
+            )
+
+    await drop_schema(async_engine)
+    await async_engine.dispose()
+    return ok
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(prog="python -m benchmarks.check_query_budgets")
+    parser.add_argument("--teams", type=int, default=50)
+    parser.add_argument("--questions", type=int, default=30)
+    parser.add_argument("--submissions", type=int, default=5_000)
+    args = parser.parse_args()
+    if not asyncio.run(main(args.teams, args.questions, args.submissions)):
+        sys.exit(1)
@@ -0,0 +1,201 @@
+"""
+Check that the queries of every route use an index on the submission table.
+
+Seeds a synthetic contest in the `benchmark` schema, requests every route
+through the app while recording the SQL it runs, and EXPLAINs each
+statement. Exits with status 1 if any of them reads the submission table
+with a sequential scan, except in routes that export every submission.
+
+Run with:
+
+    python -m benchmarks.check_query_plans [--teams 200] [--questions 50]
+        [--submissions 100000]
+"""
+
+import argparse
+import asyncio
+import html
+import json
+import re
+import sys
+from dataclasses import dataclass, field
+
+import httpx
+from sqlalchemy import event
+
+from app.core.db import async_engine
+from app.main import app
+from benchmarks.seed import (
+    BENCHMARK_SCHEMA,
+    create_schema,
+    drop_schema,
+    seed_contest,
+    use_schema,
+)
+
+# Tables that may only be read through an index
+CHECKED_TABLES = {"submission"}
+# Statements that have a plan, unlike for example SAVEPOINT
+EXPLAINABLE = ("SELECT", "INSERT", "UPDATE", "DELETE", "WITH")
+
+
+@dataclass
+class Route:
+    name: str
+    method: str
+    path: str
+    admin: bool = False
+    data: dict | None = None
+    # Routes that read the whole table by design
+    full_scan: bool = False
+    statements: list[tuple[str, tuple]] = field(default_factory=list)
+
+
+def seq_scans(plan: dict) -> list[str]:
+    """Return the checked tables that `plan` reads with a sequential scan."""
+    tables = []
+    if plan["Node Type"] == "Seq Scan" and plan["Relation Name"] in CHECKED_TABLES:
+        tables.append(plan["Relation Name"])
+    for child in plan.get("Plans", []):
+        tables += seq_scans(child)
+    return tables
+
+
+def index_names(plan: dict) -> list[str]:
+    names = [plan["Index Name"]] if "Index Name" in plan else []
+    for child in plan.get("Plans", []):
+        names += index_names(child)
+    return names
+
+
+async def login(client: httpx.AsyncClient, name: str) -> str:
+    response = await client.post("/login", data={"name": name, "password": name})
+    return response.cookies["auth_jwt"]
+
+
+async def main(teams: int, questions: int, submissions: int) -> bool:
+    use_schema(async_engine, BENCHMARK_SCHEMA)
+    print(f"Seeding {teams} teams, {questions} questions and {submissions} submissions")
+    await create_schema(async_engine)
+    await seed_contest(async_engine, teams, questions, submissions)
+
+    current: Route | None = None
+
+    @event.listens_for(async_engine.sync_engine, "before_cursor_execute")
+    def record(conn, cursor, statement, parameters, context, executemany):
+        if current is not None:
+            current.statements.append((statement, parameters))
+
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+        # team1 is the admin, see seed_contest
+        admin_token = await login(client, "team1")
+        team_token = await login(client, "team2")
+
+        client.cookies.set("auth_jwt", admin_token)
+        first_page = (await client.get("/admin/submissions")).text
+        older = html.unescape(
+            re.search(r'href="(/admin/submissions\?[^"]*)"', first_page).group(1)
+        )
+        question_id, submission_id = re.search(
+            r"/question/(\d+)/submission/(\d+)/delete", first_page
+        ).groups()
+
+        routes = [
+            Route(
+                "login", "POST", "/login", data={"name": "team2", "password": "team2"}
+            ),
+            Route("home", "GET", "/"),
+            Route("question", "GET", "/question/1"),
+            Route("submit", "POST", "/question/1/submission", data={"answer": "1.5"}),
+            Route("leaderboard", "GET", "/leaderboard"),
+            Route("questions pdf", "GET", "/questions-pdf?html"),
+            Route("admin", "GET", "/admin", admin=True),
+            Route("feed", "GET", "/admin/submissions", admin=True),
+            Route("feed older", "GET", older, admin=True),
+            Route("feed by team", "GET", "/admin/submissions?team=2", admin=True),
+            Route(
+                "feed by question", "GET", "/admin/submissions?question=1", admin=True
+            ),
+            Route(
+                "feed by team and question",
+                "GET",
+                "/admin/submissions?team=2&question=1",
+                admin=True,
+            ),
+            Route("teams.csv", "GET", "/admin/teams.csv", admin=True),
+            Route(
+                "answers.csv", "GET", "/admin/answers.csv", admin=True, full_scan=True
+            ),
+            Route(
+                "delete submission",
+                "POST",
+                f"/question/{question_id}/submission/{submission_id}/delete",
+                admin=True,
+            ),
+            Route(
+                "preview regrade",
+                "POST",
+                "/admin/question/1?dry_run=true",
+                admin=True,
+                data={
+                    "title": "Question 1",
+                    "body": "What is the answer to question 1?",
+                    "number": 1,
+                    "max_score": 1,
+                    "max_score_display": "1",
+                    "solution": "1.5",
+                    "accuracy": 2,
+                    "visible": True,
+                },
+            ),
+            Route("reset question", "POST", "/admin/question/2/reset", admin=True),
+            Route("delete team", "POST", "/admin/team/3/delete", admin=True),
+        ]
+
+        for route in routes:
+            client.cookies.set("auth_jwt", admin_token if route.admin else team_token)
+            current = route
+            response = await client.request(route.method, route.path, data=route.data)
+            current = None
+            if response.status_code >= 400:
+                raise RuntimeError(f"{route.name}: {response.status_code}")
+
+    ok = True
+    async with async_engine.connect() as conn:
+        for route in routes:
+            print(f"{route.name} ({route.method} {route.path})")
+            for statement, parameters in route.statements:
+                if not statement.lstrip().upper().startswith(EXPLAINABLE):
+                    continue
+                result = await conn.exec_driver_sql(
+                    "EXPLAIN (FORMAT JSON) " + statement, parameters
+                )
+                plan = result.scalar_one()
+                if isinstance(plan, str):
+                    plan = json.loads(plan)
+                plan = plan[0]["Plan"]
+                scans = seq_scans(plan)
+                if scans and not route.full_scan:
+                    ok = False
+                    status = "FAIL"
+                else:
+                    status = "ok"
+                summary = " ".join(statement.split())[:70]
+                indexes = ", ".join(sorted(set(index_names(plan)))) or "-"
+                scanned = f" seq scan: {', '.join(scans)}" if scans else ""
+                print(f"  {status:<4} {summary:<70} [{indexes}]{scanned}")
+
+    await drop_schema(async_engine)
+    await async_engine.dispose()
+    return ok
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(prog="python -m benchmarks.check_query_plans")
+    parser.add_argument("--teams", type=int, default=200)
+    parser.add_argument("--questions", type=int, default=50)
+    parser.add_argument("--submissions", type=int, default=100_000)
+    args = parser.parse_args()
+    if not asyncio.run(main(args.teams, args.questions, args.submissions)):
+        sys.exit(1)
@@ -0,0 +1,95 @@
+"""
+Compare request throughput of the synchronous and the async database sessions.
+
+A worker serves many requests on one event loop. With the synchronous session
+every query blocks that loop, so a single slow query, like the one of the admin
+page, holds up all fast queries, like submissions, that arrive meanwhile.
+
+Each run starts `--clients` concurrent clients doing fast queries and one
+client repeatedly doing a slow query, and reports how many fast queries got
+through and how long they took.
+
+Run with:
+
+    python -m benchmarks.db_concurrency [--clients 50] [--seconds 5]
+"""
+
+import argparse
+import asyncio
+import statistics
+import time
+
+from sqlalchemy import func
+from sqlmodel import Session, select
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from app.api.models import Team
+from app.core.db import async_engine, engine
+
+# Duration of the slow query, about the time the admin page takes on a full
+# competition
+SLOW_QUERY_SECONDS = 0.2
+
+fast_query = select(Team).where(Team.id == 1)
+slow_query = select(func.pg_sleep(SLOW_QUERY_SECONDS))
+
+
+async def run_sync(query):
+    with Session(engine) as session:
+        session.exec(query).all()
+
+
+async def run_async(query):
+    async with AsyncSession(async_engine) as session:
+        (await session.exec(query)).all()
+
+
+async def measure(run, clients: int, seconds: float) -> list[float]:
+    """Return the latencies of the fast queries done in `seconds`."""
+    deadline = time.perf_counter() + seconds
+    latencies: list[float] = []
+
+    async def fast_client():
+        while time.perf_counter() < deadline:
+            start = time.perf_counter()
+            # Queue behind the other clients, like a request arriving at a server
+            await asyncio.sleep(0)
+            await run(fast_query)
+            latencies.append(time.perf_counter() - start)
+
+    async def slow_client():
+        while time.perf_counter() < deadline:
+            await run(slow_query)
+            await asyncio.sleep(0)
+
+    await asyncio.gather(slow_client(), *(fast_client() for _ in range(clients)))
+    return latencies
+
+
+async def main(clients: int, seconds: float):
+    # Both engines get a warm pool of the same size before measuring
+    await measure(run_sync, clients, 0.5)
+    await measure(run_async, clients, 0.5)
+
+    print(
+        f"{'session':>8} {'queries/s':>10} {'p50 (ms)':>9} {'p95 (ms)':>9}"
+        f" {'max (ms)':>9}"
+    )
+    for name, run in [("sync", run_sync), ("async", run_async)]:
+        latencies = await measure(run, clients, seconds)
+        quantiles = statistics.quantiles(latencies, n=100)
+        print(
+            f"{name:>8} {len(latencies) / seconds:>10.0f}"
+            f" {quantiles[49] * 1000:>9.1f} {quantiles[94] * 1000:>9.1f}"
+            f" {max(latencies) * 1000:>9.1f}"
+        )
+
+    await async_engine.dispose()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(prog="python -m benchmarks.db_concurrency")
+    parser.add_argument("--clients", type=int, default=50)
+    parser.add_argument("--seconds", type=float, default=5.0)
+    args = parser.parse_args()
+    asyncio.run(main(args.clients, args.seconds))
@@ -0,0 +1,119 @@
+"""
+Compare the throughput of submissions committed one by one and in batches.
+
+Every submitter inserts its submissions one after the other, like teams
+submitting answers at the start of the contest. With `SUBMISSION_BATCHING`
+off every submission is its own transaction, with it on the submissions of
+concurrent submitters share one. Afterwards the team question states are
+checked against a full rebuild.
+
+Run with:
+
+    python -m benchmarks.ingest [--submitters 200] [--submissions 20]
+"""
+
+import argparse
+import asyncio
+import random
+import time
+
+from sqlmodel import select
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from app.api.ingest import SubmissionBatcher
+from app.api.models import Question, Submission, TeamQuestionState
+from app.api.scores import rebuild_team_question_state, record_submissions
+from app.api.utils import is_answer_correct
+from app.core.config import settings
+from app.core.db import async_engine
+from benchmarks.seed import (
+    BENCHMARK_SCHEMA,
+    create_schema,
+    drop_schema,
+    seed_contest,
+    use_schema,
+)
+
+QUESTIONS = 20
+
+
+async def submit_one(submission: Submission, question: Question):
+    """The transaction of `question_create_submission` without batching."""
+    async with AsyncSession(async_engine) as session:
+        session.add(submission)
+        await record_submissions(session, [(submission, question)])
+        await session.commit()
+
+
+async def run(submit, questions: list[Question], submitters: int, submissions: int):
+    async def submitter(team_id: int):
+        rng = random.Random(team_id)
+        for _ in range(submissions):
+            question = rng.choice(questions)
+            answer = question.solution if rng.random() < 0.3 else "1.5"
+            await submit(
+                Submission(
+                    team_id=team_id,
+                    question_id=question.id,
+                    answer=answer,
+                    correct=is_answer_correct(
+                        answer, question.solution, question.accuracy
+                    ),
+                ),
+                question,
+            )
+
+    start = time.perf_counter()
+    await asyncio.gather(*[submitter(team_id) for team_id in range(1, submitters + 1)])
+    return time.perf_counter() - start
+
+
+async def states_match_rebuild() -> bool:
+    query = select(TeamQuestionState).order_by(
+        TeamQuestionState.team_id, TeamQuestionState.question_id
+    )
+    async with AsyncSession(async_engine) as session:
+        incremental = [state.model_dump() for state in await session.exec(query)]
+        await rebuild_team_question_state(session)
+        rebuilt = [state.model_dump() for state in await session.exec(query)]
+        await session.rollback()
+    return incremental == rebuilt
+
+
+async def main(submitters: int, submissions: int):
+    use_schema(async_engine, BENCHMARK_SCHEMA)
+    total = submitters * submissions
+    print(f"{submitters} submitters with {submissions} submissions each")
+    print(f"{'mode':>10} {'submissions/s':>14} {'transactions':>13} {'states ok':>10}")
+    try:
+        for mode in ["single", "batched"]:
+            await create_schema(async_engine)
+            await seed_contest(async_engine, submitters, QUESTIONS, 0)
+            async with AsyncSession(async_engine) as session:
+                questions = list((await session.exec(select(Question))).all())
+
+            if mode == "single":
+                duration = await run(submit_one, questions, submitters, submissions)
+                transactions = total
+            else:
+                batcher = SubmissionBatcher(
+                    settings.SUBMISSION_BATCH_MILLISECONDS / 1000,
+                    settings.SUBMISSION_BATCH_SIZE,
+                )
+                duration = await run(batcher.submit, questions, submitters, submissions)
+                await batcher.stop()
+                transactions = batcher.batches
+
+            ok = await states_match_rebuild()
+            print(f"{mode:>10} {total / duration:>14.0f} {transactions:>13} {ok!s:>10}")
+    finally:
+        await drop_schema(async_engine)
+        await async_engine.dispose()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(prog="python -m benchmarks.ingest")
+    parser.add_argument("--submitters", type=int, default=200)
+    parser.add_argument("--submissions", type=int, default=20)
+    args = parser.parse_args()
+    asyncio.run(main(args.submitters, args.submissions))
@@ -0,0 +1,13 @@
+"""
+The app on the tables of the `benchmark` schema, served by `load_test`.
+
+Run with `uvicorn benchmarks.load_app:app`.
+"""
+
+from app.core.db import async_engine
+from app.main import app
+from benchmarks.seed import BENCHMARK_SCHEMA, use_schema
+
+use_schema(async_engine, BENCHMARK_SCHEMA)
+
+__all__ = ["app"]
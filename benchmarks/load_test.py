@@ -0,0 +1,316 @@
+"""
+Simulate a live contest against the app and report latency per route.
+
+Seeds a synthetic contest in the `benchmark` schema and lets every team
+log in, poll the leaderboard every `LEADERBOARD_POLL_SECONDS`, and
+meanwhile open the home page and a question, think, submit an answer and
+look at the question again. An admin reloads `/admin` every
+`--admin-poll` seconds. Afterwards it prints the throughput and the
+p50/p95/p99 latency of every route.
+
+With `--workers 0` the app runs in this process, otherwise it is served by
+uvicorn with that many workers, like in production.
+
+Run with:
+
+    python -m benchmarks.load_test [--teams 100] [--seconds 60] [--think 5]
+        [--workers 0] [--json results.json]
+"""
+
+import argparse
+import asyncio
+import contextlib
+import json
+import math
+import random
+import subprocess
+import sys
+import time
+from collections import defaultdict
+from collections.abc import AsyncIterator
+
+import httpx
+from sqlmodel import select
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from app.api.models import Question
+from benchmarks.seed import (
+    BENCHMARK_SCHEMA,
+    create_schema,
+    drop_schema,
+    schema_engine,
+    seed_contest,
+)
+
+LEADERBOARD_POLL_SECONDS = 3.0
+QUESTIONS = 20
+# Submissions made before the simulation starts, per team
+PRIOR_SUBMISSIONS = 20
+# Fraction of the simulated submissions that are correct
+CORRECT_FRACTION = 0.3
+PORT = 8765
+
+
+class Recorder:
+    """Latencies of the requests of every route."""
+
+    def __init__(self):
+        self.latencies: dict[str, list[float]] = defaultdict(list)
+        self.errors: dict[str, int] = defaultdict(int)
+
+    async def request(
+        self, client: httpx.AsyncClient, route: str, method: str, url: str, **kwargs
+    ) -> httpx.Response | None:
+        start = time.perf_counter()
+        try:
+            response = await client.request(method, url, **kwargs)
+        except httpx.HTTPError:
+            self.errors[route] += 1
+            return None
+        self.latencies[route].append(time.perf_counter() - start)
+        if response.status_code >= 400:
+            self.errors[route] += 1
+        return response
+
+    def report(self, seconds: float) -> dict[str, dict]:
+        results = {}
+        for route in sorted(self.latencies.keys() | self.errors.keys()):
+            latencies = sorted(self.latencies[route])
+            results[route] = {
+                "requests": len(latencies),
+                "errors": self.errors[route],
+                "per_second": len(latencies) / seconds,
+                "p50_ms": percentile(latencies, 50) * 1000,
+                "p95_ms": percentile(latencies, 95) * 1000,
+                "p99_ms": percentile(latencies, 99) * 1000,
+            }
+        return results
+
+
+def percentile(values: list[float], p: float) -> float:
+    """Return the nearest-rank `p`th percentile of the sorted `values`."""
+    if not values:
+        return 0.0
+    return values[max(0, math.ceil(len(values) * p / 100) - 1)]
+
+
+async def team(
+    client: httpx.AsyncClient,
+    recorder: Recorder,
+    name: str,
+    solutions: dict[int, str],
+    deadline: float,
+    think: float,
+    rng: random.Random,
+):
+    response = await recorder.request(
+        client, "POST /login", "POST", "/login", data={"name": name, "password": name}
+    )
+    if response is None or "auth_jwt" not in response.cookies:
+        return
+    client.cookies.set("auth_jwt", response.cookies["auth_jwt"])
+
+    async def poll_leaderboard():
+        # Browsers don't all open the page at the same moment
+        await asyncio.sleep(rng.uniform(0, LEADERBOARD_POLL_SECONDS))
+        while time.perf_counter() < deadline:
+            await recorder.request(client, "GET /leaderboard", "GET", "/leaderboard")
+            await asyncio.sleep(LEADERBOARD_POLL_SECONDS)
+
+    poller = asyncio.create_task(poll_leaderboard())
+    try:
+        while time.perf_counter() < deadline:
+            await recorder.request(client, "GET /", "GET", "/")
+            question_id = rng.choice(list(solutions))
+            path = f"/question/{question_id}"
+            await recorder.request(client, "GET /question/{id}", "GET", path)
+            await asyncio.sleep(rng.expovariate(1 / think))
+            if time.perf_counter() >= deadline:
+                break
+            if rng.random() < CORRECT_FRACTION:
+                answer = solutions[question_id]
+            else:
+                answer = f"{rng.randint(0, 99)}.{rng.randrange(10**6):06d}"
+            await recorder.request(
+                client,
+                "POST /question/{id}/submission",
+                "POST",
+                f"{path}/submission",
+                data={"answer": answer},
+            )
+            # Where the submission redirects to
+            await recorder.request(client, "GET /question/{id}", "GET", path)
+            await asyncio.sleep(rng.expovariate(1 / think))
+    finally:
+        poller.cancel()
+
+
+async def admin(
+    client: httpx.AsyncClient, recorder: Recorder, deadline: float, poll: float
+):
+    response = await recorder.request(
+        client,
+        "POST /login",
+        "POST",
+        "/login",
+        data={"name": "team1", "password": "team1"},
+    )
+    if response is None or "auth_jwt" not in response.cookies:
+        return
+    client.cookies.set("auth_jwt", response.cookies["auth_jwt"])
+    while time.perf_counter() < deadline:
+        await recorder.request(client, "GET /admin", "GET", "/admin")
+        await asyncio.sleep(poll)
+
+
+@contextlib.asynccontextmanager
+async def transport(
+    workers: int,
+) -> AsyncIterator[tuple[httpx.AsyncBaseTransport | None, str]]:
+    """Yield the transport and base url of the app under test."""
+    if workers == 0:
+        from benchmarks.load_app import app
+
+        async with app.router.lifespan_context(app):
+            yield httpx.ASGITransport(app=app), "http://test"
+        return
+
+    server = subprocess.Popen(
+        [
+            sys.executable,
+            "-m",
+            "uvicorn",
+            "benchmarks.load_app:app",
+            f"--port={PORT}",
+            f"--workers={workers}",
+            "--log-level=warning",
+        ]
+    )
+    base_url = f"http://127.0.0.1:{PORT}"
+    try:
+        async with httpx.AsyncClient(base_url=base_url) as client:
+            for _ in range(300):
+                try:
+                    await client.get("/login")
+                    break
+                except httpx.TransportError:
+                    await asyncio.sleep(0.1)
+            else:
+                raise RuntimeError("The server did not start")
+        yield None, base_url
+    finally:
+        server.terminate()
+        server.wait()
+
+
+async def main(
+    teams: int,
+    seconds: float,
+    think: float,
+    admin_poll: float,
+    workers: int,
+    json_path: str | None,
+):
+    engine = schema_engine()
+    print(f"Seeding {teams} teams and {QUESTIONS} questions in {BENCHMARK_SCHEMA}")
+    await create_schema(engine)
+    await seed_contest(engine, teams + 1, QUESTIONS, teams * PRIOR_SUBMISSIONS)
+    async with AsyncSession(engine) as session:
+        solutions = dict(
+            (await session.exec(select(Question.id, Question.solution))).all()
+        )
+    await engine.dispose()
+
+    recorder = Recorder()
+    try:
+        async with transport(workers) as (app_transport, base_url):
+            print(
+                f"Simulating {teams} teams for {seconds:.0f}s"
+                f" ({'in process' if workers == 0 else f'{workers} workers'})"
+            )
+            deadline = time.perf_counter() + seconds
+            clients = [
+                httpx.AsyncClient(
+                    transport=app_transport, base_url=base_url, timeout=60
+                )
+                for _ in range(teams + 1)
+            ]
+            start = time.perf_counter()
+            # Team 1 is the admin, see seed_contest
+            await asyncio.gather(
+                admin(clients[0], recorder, deadline, admin_poll),
+                *[
+                    team(
+                        client,
+                        recorder,
+                        f"team{i}",
+                        solutions,
+                        deadline,
+                        think,
+                        random.Random(i),
+                    )
+                    for i, client in enumerate(clients[1:], start=2)
+                ],
+            )
+            duration = time.perf_counter() - start
+            for client in clients:
+                await client.aclose()
+    finally:
+        engine = schema_engine()
+        await drop_schema(engine)
+        await engine.dispose()
+
+    results = recorder.report(duration)
+    print(
+        f"{'route':<32} {'requests':>9} {'errors':>7} {'req/s':>7}"
+        f" {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8}"
+    )
+    for route, result in results.items():
+        print(
+            f"{route:<32} {result['requests']:>9} {result['errors']:>7}"
+            f" {result['per_second']:>7.1f} {result['p50_ms']:>8.1f}"
+            f" {result['p95_ms']:>8.1f} {result['p99_ms']:>8.1f}"
+        )
+    if json_path is not None:
+        with open(json_path, "w") as file:
+            json.dump(
+                {
+                    "teams": teams,
+                    "seconds": duration,
+                    "think": think,
+                    "workers": workers,
+                    "routes": results,
+                },
+                file,
+                indent=2,
+            )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(prog="python -m benchmarks.load_test")
+    parser.add_argument("--teams", type=int, default=100)
+    parser.add_argument("--seconds", type=float, default=60)
+    parser.add_argument(
+        "--think", type=float, default=5, help="mean seconds between team actions"
+    )
+    parser.add_argument(
+        "--admin-poll", type=float, default=5, help="seconds between admin reloads"
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=0,
+        help="uvicorn workers serving the app, 0 to run it in this process",
+    )
+    parser.add_argument("--json", help="also write the results to this file")
+    args = parser.parse_args()
+    asyncio.run(
+        main(
+            args.teams,
+            args.seconds,
+            args.think,
+            args.admin_poll,
+            args.workers,
+            args.json,
+        )
+    )
@@ -0,0 +1,59 @@
+"""
+Compare the vectorized logo degradation with the original per-pixel loop.
+
+Run with:
+
+    python -m benchmarks.logo
+"""
+
+import random
+import timeit
+
+from PIL import Image
+
+from app.api.utils import LogoDegrader
+
+SIZES = [(64, 46), (250, 179), (500, 358), (1000, 716)]
+QUALITIES = [0.0, 0.25, 0.5, 0.75, 1.0]
+
+
+def generate_logo_loop(
+    img: Image.Image, quality: float, background=(100, 66, 150)
+) -> Image.Image:
+    """The original implementation of `generate_logo`, kept as a reference."""
+    img = img.copy()
+    width, height = img.size
+    random.seed(1)
+    pixels = img.load()
+    assert pixels is not None
+    for x in range(width):
+        for y in range(height):
+            if random.random() > quality:
+                pixels[x, y] = background
+    return img
+
+
+def main():
+    logo = Image.open("app/static/images/prime.webp")
+    print(f"{'size':>10} {'loop (ms)':>10} {'numpy (ms)':>11} {'speedup':>8}")
+    for size in SIZES:
+        img = logo.resize(size)
+        degrader = LogoDegrader(img)
+
+        for quality in QUALITIES:
+            for background in [(100, 66, 150), (19, 23, 31)]:
+                expected = generate_logo_loop(img, quality, background)
+                actual = degrader.degrade(quality, background)
+                assert expected.tobytes() == actual.tobytes(), (size, quality)
+
+        number = 5
+        loop = timeit.timeit(lambda: generate_logo_loop(img, 0.5), number=number)
+        vectorized = timeit.timeit(lambda: degrader.degrade(0.5), number=number)
+        print(
+            f"{size[0]:>4}x{size[1]:<5} {loop / number * 1000:>10.2f}"
+            f" {vectorized / number * 1000:>11.2f} {loop / vectorized:>7.1f}x"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,263 @@
+"""
+Time the scoring, validation and rendering helpers on fixed inputs.
+
+The inputs are the questions of `app/mock/2024_questions.sql`, loaded into
+the `benchmark` schema together with a seeded set of teams and
+submissions, so every run measures the same work. Each benchmark is
+calibrated to run for at least `MIN_SECONDS` and repeated `REPEAT` times,
+the median time per call is the number to compare.
+
+Results are written as json with the commit they were measured on, and
+`--compare` prints the change against an earlier file:
+
+    python -m benchmarks.micro [--only logo] [--output results.json]
+        [--compare .cache/benchmarks/micro-<commit>.json]
+"""
+
+import argparse
+import asyncio
+import inspect
+import json
+import os
+import platform
+import re
+import statistics
+import subprocess
+import tempfile
+import time
+from collections.abc import Callable
+from datetime import datetime, timezone
+from pathlib import Path
+
+from sqlalchemy import insert, text
+from sqlmodel import select
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from app.api.models import Question, Submission, Team
+from app.api.pdf import questions_pdf_html
+from app.api.scores import rebuild_team_question_state
+from app.api.utils import (
+    encoded_logo,
+    generate_logo,
+    get_team_score,
+    is_answer_correct,
+    prerender_questions,
+    validate_question_answer,
+)
+from app.core import render_utils
+from app.core.config import settings
+from app.core.render_utils import render_html_to_pdf, render_md_to_html
+from benchmarks.seed import create_schema, drop_schema, schema_engine
+
+QUESTIONS_SQL = Path("app/mock/2024_questions.sql")
+RESULTS_DIR = Path(".cache/benchmarks")
+MIN_SECONDS = 0.2
+REPEAT = 5
+TEAMS = 50
+SUBMISSIONS_PER_TEAM = 40
+LOGO_QUALITIES = [0.0, 0.25, 0.5, 0.75, 1.0]
+
+
+async def load_questions(engine) -> list[Question]:
+    """Load the mock questions, and seed teams with submissions on them."""
+    await create_schema(engine)
+    async with engine.begin() as conn:
+        # The mock questions leave accuracy at its default, which is only
+        # known by the model
+        default = Question.model_fields["accuracy"].default
+        await conn.execute(
+            text(f"ALTER TABLE question ALTER COLUMN accuracy SET DEFAULT {default}")
+        )
+        # The file holds several statements, which asyncpg only runs unprepared
+        raw = await conn.get_raw_connection()
+        await raw.driver_connection.execute(QUESTIONS_SQL.read_text())
+
+        questions = (
+            await conn.execute(select(Question.id, Question.solution).order_by("id"))
+        ).all()
+        await conn.execute(
+            insert(Team),
+            [
+                {"id": i, "name": f"team{i}", "password": f"team{i}"}
+                for i in range(1, TEAMS + 1)
+            ],
+        )
+        submissions = []
+        for i in range(TEAMS * SUBMISSIONS_PER_TEAM):
+            question_id, solution = questions[i % len(questions)]
+            answer = solution if i % 7 == 0 else str(i)
+            submissions.append(
+                {
+                    "team_id": i % TEAMS + 1,
+                    "question_id": question_id,
+                    "answer": answer,
+                    "correct": answer == solution,
+                    "timestamp": datetime(2025, 3, 1, 14),
+                }
+            )
+        await conn.execute(insert(Submission), submissions)
+
+    async with AsyncSession(engine) as session:
+        await rebuild_team_question_state(session)
+        await session.commit()
+        questions = list(
+            (await session.exec(select(Question).order_by(Question.number))).all()
+        )
+    async with engine.begin() as conn:
+        await conn.execute(text("ANALYZE"))
+    return questions
+
+
+def answer_inputs(questions: list[Question]) -> list[tuple[str, str, int]]:
+    """Correct, wrong and less accurate answers to every question."""
+    inputs = []
+    for question in questions:
+        solution = question.solution
+        inputs.append((solution, solution, question.accuracy))
+        inputs.append((solution[:-1] + "0", solution, question.accuracy))
+        if "." in solution:
+            inputs.append((solution[:-2], solution, 2))
+    return inputs
+
+
+async def measure(call: Callable) -> dict:
+    """Return the time per call of `call`, which may be a coroutine function."""
+    is_async = inspect.iscoroutinefunction(call)
+
+    async def run(number: int) -> float:
+        start = time.perf_counter()
+        for _ in range(number):
+            if is_async:
+                await call()
+            else:
+                call()
+        return time.perf_counter() - start
+
+    number = 1
+    while (duration := await run(number)) < MIN_SECONDS:
+        number = max(number * 2, int(number * MIN_SECONDS / max(duration, 1e-9)))
+    times = [await run(number) / number for _ in range(REPEAT)]
+    return {
+        "number": number,
+        "repeat": REPEAT,
+        "median_us": statistics.median(times) * 1e6,
+        "min_us": min(times) * 1e6,
+    }
+
+
+def environment() -> dict:
+    commit = subprocess.run(
+        ["git", "describe", "--always", "--dirty"], capture_output=True, text=True
+    ).stdout.strip()
+    return {
+        "commit": commit or None,
+        "date": datetime.now(timezone.utc).isoformat(),
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "cpus": os.cpu_count(),
+        # Math renders much faster through the daemon than through tex2svg
+        "mathjax_daemon": os.path.exists(settings.MATHJAX_SOCKET),
+    }
+
+
+async def main(only: str | None, output: Path | None, compare: Path | None):
+    # Start from an empty render cache, and keep the renders of the mock
+    # questions out of the one of the app
+    render_utils.render_cache.directory = Path(tempfile.mkdtemp())
+    render_md_to_html.cache_clear()
+
+    engine = schema_engine()
+    try:
+        questions = await load_questions(engine)
+        answers = answer_inputs(questions)
+        bodies = [question.body for question in questions]
+        logo = generate_logo(0.5)
+
+        prerender_questions(questions)
+        # Remote images would make the pdf depend on the network
+        pdf_html = re.sub(r"<img[^>]*>", "", questions_pdf_html(questions))
+
+        async with AsyncSession(engine) as session:
+            team = await session.get(Team, 1)
+            assert team is not None
+
+            # Fill the on-disk and in-process caches
+            for body in bodies:
+                render_md_to_html(body)
+
+            async def team_score():
+                await get_team_score(session, team, questions)
+
+            benchmarks: dict[str, Callable] = {
+                "generate_logo": lambda: [generate_logo(q) for q in LOGO_QUALITIES],
+                "encoded_logo": lambda: encoded_logo(logo),
+                "is_answer_correct": lambda: [is_answer_correct(*a) for a in answers],
+                "validate_question_answer": lambda: [
+                    validate_question_answer(f" {a.replace('.', ',')} ")
+                    for a, _, _ in answers
+                ],
+                "get_team_score": team_score,
+                # Pandoc and MathJax, without any cache
+                "render_md_to_html (cold)": lambda: [
+                    render_utils._render_md_to_html_batch([(body, False)])
+                    for body in bodies
+                ],
+                # All bodies in one batch, without any cache
+                "render_md_to_html (batch)": lambda: (
+                    render_utils._render_md_to_html_batch(
+                        [(body, False) for body in bodies]
+                    )
+                ),
+                # Read from the on-disk cache
+                "render_md_to_html (disk)": lambda: [
+                    render_md_to_html.__wrapped__(body) for body in bodies
+                ],
+                # In-process lru cache
+                "render_md_to_html (warm)": lambda: [
+                    render_md_to_html(body) for body in bodies
+                ],
+                "render_html_to_pdf": lambda: render_html_to_pdf.__wrapped__(pdf_html),
+            }
+            results = {}
+            for name, call in benchmarks.items():
+                if only is not None and only not in name:
+                    continue
+                results[name] = await measure(call)
+                print(f"{name:<28} {results[name]['median_us']:>12.1f} us")
+    finally:
+        await drop_schema(engine)
+        await engine.dispose()
+
+    if compare is not None:
+        previous = json.loads(compare.read_text())
+        print(f"\nCompared with {previous['environment']['commit']}:")
+        print(f"{'benchmark':<28} {'before (us)':>12} {'after (us)':>12} {'change':>8}")
+        for name, result in results.items():
+            if name not in previous["results"]:
+                continue
+            before = previous["results"][name]["median_us"]
+            after = result["median_us"]
+            print(
+                f"{name:<28} {before:>12.1f} {after:>12.1f}"
+                f" {(after - before) / before * 100:>+7.1f}%"
+            )
+
+    env = environment()
+    if output is None:
+        output = RESULTS_DIR / f"micro-{env['commit'] or 'unknown'}.json"
+    output.parent.mkdir(parents=True, exist_ok=True)
+    output.write_text(
+        json.dumps({"environment": env, "results": results}, indent=2) + "\n"
+    )
+    print(f"\nWrote {output}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(prog="python -m benchmarks.micro")
+    parser.add_argument("--only", help="only run benchmarks whose name contains this")
+    parser.add_argument("--output", type=Path, help="json file to write the results to")
+    parser.add_argument(
+        "--compare", type=Path, help="json file of an earlier run to compare with"
+    )
+    args = parser.parse_args()
+    asyncio.run(main(args.only, args.output, args.compare))
@@ -0,0 +1,94 @@
+"""
+Compare regrading a question row by row with the set-based regrade.
+
+Updating the solution of a question used to load all of its submissions,
+grade them one by one in Python and write every one of them back. Now
+`regrade_question` runs a single UPDATE over the ones that flip. Both change
+the solution of the first question to a wrong answer and are rolled back.
+
+Run with:
+
+    python -m benchmarks.regrade [--teams 200] [--questions 5]
+        [--submissions 100000]
+"""
+
+import argparse
+import asyncio
+import time
+
+from sqlmodel import select
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from app.api.models import Question, Submission
+from app.api.regrade import regrade_question
+from app.api.scores import rebuild_team_question_state
+from app.api.utils import is_answer_correct
+from benchmarks.seed import create_schema, drop_schema, schema_engine, seed_contest
+
+# A solution no seeded answer has, so every correct submission flips
+WRONG_SOLUTION = "100.0"
+
+
+async def regrade_rows(session: AsyncSession, question: Question) -> int:
+    """The original regrade of `admin_question_update`."""
+    submissions = (
+        await session.exec(
+            select(Submission).where(Submission.question_id == question.id)
+        )
+    ).all()
+    flipped = 0
+    for submission in submissions:
+        correct = is_answer_correct(
+            submission.answer, question.solution, question.accuracy
+        )
+        flipped += correct != submission.correct
+        submission.correct = correct
+    session.add_all(submissions)
+    await rebuild_team_question_state(session, question_id=question.id)
+    return flipped
+
+
+async def timed(engine, regrade) -> tuple[float, int]:
+    async with AsyncSession(engine) as session:
+        question = await session.get(Question, 1)
+        question.solution = WRONG_SOLUTION
+        session.add(question)
+        start = time.perf_counter()
+        flipped = await regrade(session, question)
+        await session.flush()
+        duration = time.perf_counter() - start
+        await session.rollback()
+    return duration, flipped
+
+
+async def main(teams: int, questions: int, submissions: int):
+    engine = schema_engine()
+    try:
+        print(
+            f"Seeding {teams} teams, {questions} questions"
+            f" and {submissions} submissions"
+        )
+        await create_schema(engine)
+        await seed_contest(engine, teams, questions, submissions)
+
+        rows, rows_flipped = await timed(engine, regrade_rows)
+        set_based, report = await timed(engine, regrade_question)
+        assert rows_flipped == report.submissions
+
+        print(f"{rows_flipped} submission(s) flip on {len(report.teams)} team(s)")
+        print(f"{'row by row (ms)':>16} {'set-based (ms)':>15} {'speedup':>8}")
+        print(
+            f"{rows * 1000:>16.1f} {set_based * 1000:>15.1f} {rows / set_based:>7.1f}x"
+        )
+    finally:
+        await drop_schema(engine)
+        await engine.dispose()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(prog="python -m benchmarks.regrade")
+    parser.add_argument("--teams", type=int, default=200)
+    parser.add_argument("--questions", type=int, default=5)
+    parser.add_argument("--submissions", type=int, default=100_000)
+    args = parser.parse_args()
+    asyncio.run(main(args.teams, args.questions, args.submissions))
@@ -0,0 +1,140 @@
+"""
+Synthetic contests for the benchmarks.
+
+A contest is seeded in its own schema of the configured database, so
+benchmarks never touch the real teams, questions and submissions.
+"""
+
+import random
+from datetime import datetime, timedelta
+
+from sqlalchemy import event, insert, text
+from sqlalchemy.ext.asyncio import AsyncEngine, create_async_engine
+from sqlmodel import SQLModel
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from app.api.models import Question, Submission, Team
+from app.api.scores import rebuild_team_question_state
+from app.api.utils import is_answer_correct
+from app.core.config import settings
+
+BENCHMARK_SCHEMA = "benchmark"
+
+# Fraction of the submissions that are correct
+CORRECT_FRACTION = 0.3
+
+
+def schema_engine(schema: str = BENCHMARK_SCHEMA) -> AsyncEngine:
+    """Return an async engine whose tables live in `schema`."""
+    return create_async_engine(
+        str(settings.SQLALCHEMY_ASYNC_DATABASE_URI),
+        connect_args={"server_settings": {"search_path": schema}},
+    )
+
+
+def use_schema(engine: AsyncEngine, schema: str = BENCHMARK_SCHEMA):
+    """Make the new connections of an existing engine use the tables in `schema`."""
+
+    @event.listens_for(engine.sync_engine, "connect", insert=True)
+    def set_search_path(dbapi_connection, connection_record):
+        autocommit = dbapi_connection.autocommit
+        dbapi_connection.autocommit = True
+        cursor = dbapi_connection.cursor()
+        cursor.execute(f"SET SESSION search_path TO {schema}")
+        cursor.close()
+        dbapi_connection.autocommit = autocommit
+
+
+async def create_schema(engine: AsyncEngine, schema: str = BENCHMARK_SCHEMA):
+    """(Re)create `schema` with empty tables."""
+    async with engine.begin() as conn:
+        await conn.execute(text(f"DROP SCHEMA IF EXISTS {schema} CASCADE"))
+        await conn.execute(text(f"CREATE SCHEMA {schema}"))
+        await conn.run_sync(SQLModel.metadata.create_all)
+
+
+async def drop_schema(engine: AsyncEngine, schema: str = BENCHMARK_SCHEMA):
+    async with engine.begin() as conn:
+        await conn.execute(text(f"DROP SCHEMA IF EXISTS {schema} CASCADE"))
+
+
+async def seed_contest(
+    engine: AsyncEngine,
+    teams: int,
+    questions: int,
+    submissions: int,
+    seed: int = 1,
+):
+    """
+    Fill empty tables with a contest of the given size.
+
+    Team `i` is called `team{i}` with password `team{i}`, the first team is an
+    admin. Submissions are spread uniformly over teams and questions during
+    three hours, and `CORRECT_FRACTION` of them is correct.
+    """
+    rng = random.Random(seed)
+    start = datetime(2025, 3, 1, 14)
+
+    team_rows = [
+        {"id": i, "name": f"team{i}", "password": f"team{i}", "admin": i == 1}
+        for i in range(1, teams + 1)
+    ]
+    question_rows = []
+    for i in range(1, questions + 1):
+        accuracy = rng.randint(2, 8)
+        solution = f"{rng.randint(0, 99)}.{rng.randrange(10**9):09d}"
+        question_rows.append(
+            {
+                "id": i,
+                "number": i,
+                "title": f"Question {i}",
+                "body": f"What is the answer to question {i}?",
+                "max_score": float(rng.randint(1, 10)),
+                "max_score_display": str(i),
+                "visible": True,
+                "accuracy": accuracy,
+                "solution": solution,
+            }
+        )
+    submission_rows = []
+    for i in range(1, submissions + 1):
+        question = rng.choice(question_rows)
+        if rng.random() < CORRECT_FRACTION:
+            answer = question["solution"]
+        else:
+            answer = f"{rng.randint(0, 99)}.{rng.randrange(10**6):06d}"
+        submission_rows.append(
+            {
+                "id": i,
+                "team_id": rng.randint(1, teams),
+                "question_id": question["id"],
+                "answer": answer,
+                "correct": is_answer_correct(
+                    answer, question["solution"], question["accuracy"]
+                ),
+                "timestamp": start
+                + timedelta(seconds=3 * 60 * 60 * (i / max(submissions, 1))),
+            }
+        )
+
+    async with engine.begin() as conn:
+        await conn.execute(insert(Team), team_rows)
+        await conn.execute(insert(Question), question_rows)
+        if submission_rows:
+            await conn.execute(insert(Submission), submission_rows)
+        for table in ["team", "question", "submission"]:
+            await conn.execute(
+                text(
+                    f"SELECT setval(pg_get_serial_sequence('{table}', 'id'),"
+                    f" (SELECT max(id) FROM {table}))"
+                )
+            )
+
+    async with AsyncSession(engine) as session:
+        await rebuild_team_question_state(session)
+        await session.commit()
+
+    async with engine.begin() as conn:
+        await conn.execute(
+            text("ANALYZE team, question, submission, team_question_state")
+        )
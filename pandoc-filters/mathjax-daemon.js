@@ -0,0 +1,118 @@
+#!/usr/bin/env node
+
+//  Long-running MathJax renderer.
+//
+//  Starting `tex2svg` dominates the render time of formula heavy questions,
+//  so this keeps a single MathJax instance alive and serves it over a unix
+//  socket. Every line received on a connection is a JSON request
+//
+//    {"formulas": [{"tex": "\\sqrt{2}", "inline": true}, ...]}
+//
+//  and is answered with one JSON line
+//
+//    {"svgs": ["<svg ...>\n", ...]}
+//
+//  where a formula that failed to render is `null`. An invalid request is
+//  answered with `{"error": "..."}` instead. Rendered formulas are cached,
+//  so the cache is shared by every process using the daemon.
+//
+//  Usage: node pandoc-filters/mathjax-daemon.js [socket path]
+
+const fs = require('fs');
+const net = require('net');
+const readline = require('readline');
+const mjAPI = require('mathjax-node-sre');
+
+const socketPath =
+    process.argv[2] || process.env.MATHJAX_SOCKET || '/tmp/coma-mathjax.sock';
+
+//  Maximum number of cached formulas
+const cacheSize = 10000;
+
+//  The same options math2svg.lua passes to tex2svg
+mjAPI.config({MathJax: {SVG: {font: 'TeX'}}, extensions: ''});
+mjAPI.start();
+
+const options = {
+    svg: true,
+    speakText: false,
+    linebreaks: true,
+    ex: 6,
+    width: 100,
+};
+
+const cache = new Map();
+
+function typeset(tex, inline) {
+    return new Promise(resolve => {
+        mjAPI.typeset(
+            {...options, math: tex, format: inline ? 'inline-TeX' : 'TeX'},
+            data => resolve(data.errors ? null : data.svg + '\n'),
+        );
+    });
+}
+
+function render(tex, inline) {
+    const key = (inline ? 'inline:' : 'display:') + tex;
+    let svg = cache.get(key);
+    if (svg === undefined) {
+        svg = typeset(tex, inline);
+        if (cache.size >= cacheSize) {
+            cache.delete(cache.keys().next().value);
+        }
+        cache.set(key, svg);
+    }
+    return svg;
+}
+
+function parse(line) {
+    const request = JSON.parse(line);
+    if (
+        request === null ||
+        !Array.isArray(request.formulas) ||
+        !request.formulas.every(f => f !== null && typeof f.tex === 'string')
+    ) {
+        throw new Error('expected {"formulas": [{"tex": ..., "inline": ...}, ...]}');
+    }
+    return request;
+}
+
+function handle(conn, line) {
+    let request;
+    try {
+        request = parse(line);
+    } catch (err) {
+        conn.write(JSON.stringify({error: String(err)}) + '\n');
+        return;
+    }
+    Promise.all(request.formulas.map(f => render(f.tex, Boolean(f.inline)))).then(
+        svgs => conn.write(JSON.stringify({svgs}) + '\n'),
+        err => conn.write(JSON.stringify({error: String(err)}) + '\n'),
+    );
+}
+
+if (fs.existsSync(socketPath)) {
+    fs.unlinkSync(socketPath);
+}
+
+const server = net.createServer(conn => {
+    conn.on('error', () => conn.destroy());
+    //  A bad request must never take the daemon down for every worker
+    readline.createInterface({input: conn}).on('line', line => {
+        try {
+            handle(conn, line);
+        } catch (err) {
+            console.error(err);
+            conn.write(JSON.stringify({error: String(err)}) + '\n');
+        }
+    });
+});
+
+server.listen(socketPath, () => {
+    console.log(`MathJax daemon listening on ${socketPath}`);
+});
+
+//  Closing the server removes the socket, so clients fall back immediately
+for (const signal of ['SIGINT', 'SIGTERM']) {
+    process.on(signal, () => server.close(() => process.exit(0)));
+}
@@ -0,0 +1,14 @@
+--  Parse a batch of markdown fragments in a single pandoc process.
+--
+--  Every top-level block of the input is a raw markdown block holding one
+--  fragment. It is replaced by a div with the blocks of that fragment, read
+--  as a document of its own, so reference links and header ids never leak
+--  from one fragment into another.
+
+function Pandoc(doc)
+    local blocks = {}
+    for i, block in ipairs(doc.blocks) do
+        blocks[i] = pandoc.Div(pandoc.read(block.text, 'markdown').blocks)
+    end
+    return pandoc.Pandoc(blocks, doc.meta)
+end
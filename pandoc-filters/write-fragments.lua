@@ -0,0 +1,34 @@
+--  Write a batch of documents to html in a single pandoc process.
+--
+--  Every top-level block of the input is a div with the blocks of one
+--  document. It is replaced by a raw html block with the html of that
+--  document, written on its own with the math2svg filter and the MathML
+--  fallback, which is what `pandoc --lua-filter=math2svg.lua --mathml` writes.
+--  Footnotes are therefore numbered and placed per document.
+
+--  math2svg only emits svg when it believes it is writing html
+FORMAT = 'html'
+
+local math2svg = dofile('pandoc-filters/math2svg.lua')
+
+local function Pandoc(doc)
+    local blocks = {}
+    for i, div in ipairs(doc.blocks) do
+        local fragment = pandoc.Pandoc(div.content)
+        for _, filter in ipairs(math2svg) do
+            --  Walking a document doesn't pass its metadata to the filter
+            if filter.Meta then
+                filter.Meta(fragment.meta)
+            end
+            fragment = fragment:walk(filter)
+        end
+        local html = pandoc.write(fragment, 'html', {html_math_method = 'mathml'})
+        --  The pandoc program ends its html with a newline, pandoc.write doesn't
+        blocks[i] = pandoc.RawBlock('html', html .. '\n')
+    end
+    return pandoc.Pandoc(blocks, doc.meta)
+end
+
+--  Loading math2svg defined its functions globally, which would otherwise
+--  also run on the batch itself
+return {{Pandoc = Pandoc}}
@@ -1,3 +1,6 @@
 #!/usr/bin/env bash
 
+node pandoc-filters/mathjax-daemon.js &
+trap "kill $!" EXIT
+
 fastapi run --reload app/main.py